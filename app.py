@@ -1,14 +1,35 @@
 import streamlit as st
 import os
 from dotenv import load_dotenv
-from src.vector_store import create_vectorstore_from_pdf
-from src.knowledge_graph import load_or_create_knowledge_graph
-from src.hybrid_agent import HybridRAGAgent
+from src.startup import StartupTimer
 import time
 
 # Load environment variables
 load_dotenv()
 DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() == "true"
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL = int(os.getenv("RETRIEVAL_CACHE_TTL", "3600"))
+# e.g. 0.95 to also reuse results for near-duplicate questions; unset disables it
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0") or 0) or None
+# Answers for identical prompts are reused across restarts; RESPONSE_CACHE_PATH="" disables it
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "50000"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+# Stage latency histograms in Prometheus text format: served on METRICS_PORT at /metrics
+# and/or rewritten to METRICS_FILE after each answer (node_exporter textfile collector)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0) or None
+METRICS_FILE = os.getenv("METRICS_FILE") or None
+# Per-stage retrieval timeouts in seconds; unset waits for both stages
+VECTOR_TIMEOUT = float(os.getenv("VECTOR_TIMEOUT", "0") or 0) or None
+GRAPH_TIMEOUT = float(os.getenv("GRAPH_TIMEOUT", "0") or 0) or None
+# Prompt context size in estimated tokens, and an optional cross-encoder reranking stage
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "800"))
+RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "False").lower() == "true"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "8"))
+# BM25 over the same chunks as a third retrieval channel, for exact medical terms
+BM25_ENABLED = os.getenv("BM25_ENABLED", "False").lower() == "true"
+# URL of a running query server (python -m src.server); the UI then loads no indexes itself
+QUERY_SERVER_URL = os.getenv("QUERY_SERVER_URL") or None
 
 # Configuration
 PDF_PATH = "data/The_GALE_ENCYCLOPEDIA_of_MEDICINE_SECOND.pdf"
@@ -21,23 +42,71 @@ st.set_page_config(
 
 @st.cache_resource
 def initialize_system_cached():
-    """Initialize the complete system with caching"""
+    """Initialize the complete system with caching; returns (agent, startup_report)"""
     try:
         print("🚀 Initializing system...")
-        vs = create_vectorstore_from_pdf(PDF_PATH)
+        timer = StartupTimer()
+        if QUERY_SERVER_URL:
+            from src.client import RemoteAgent
+            from src.metrics import get_metrics
+            with timer.phase("connect"):
+                agent = RemoteAgent(QUERY_SERVER_URL)
+                health = agent.health()
+            print(f"✅ Query server at {QUERY_SERVER_URL}: {health['vectors']} chunks, "
+                  f"{health['graph_nodes']} graph nodes")
+            if METRICS_PORT:
+                get_metrics().serve(METRICS_PORT)
+            return agent, timer.report()
+        # Heavy libraries (torch, transformers, faiss, langchain) load here, after the first render
+        with timer.phase("imports"):
+            from src.vector_store import create_vectorstore_from_pdf, get_embeddings
+            from src.knowledge_graph import load_or_create_knowledge_graph
+            from src.hybrid_agent import HybridRAGAgent
+            from src.cache import ResponseCache, RetrievalCache
+            from src.reranker import CrossEncoderReranker
+            from src.metrics import get_metrics
+            from src.bm25_index import load_or_build_bm25
+        with timer.phase("model load"):
+            get_embeddings()
+        with timer.phase("index load"):
+            vs = create_vectorstore_from_pdf(PDF_PATH)
         print(f"✅ Vector store loaded: {vs.index.ntotal} chunks")
-        kg = load_or_create_knowledge_graph(PDF_PATH)
+        lexical_index = None
+        if BM25_ENABLED:
+            with timer.phase("bm25 load"):
+                lexical_index = load_or_build_bm25(vs)
+        with timer.phase("graph load"):
+            kg = load_or_create_knowledge_graph(PDF_PATH)
         stats = kg.get_graph_stats()
         print(f"✅ Knowledge graph loaded: {stats['nodes']} nodes, {stats['edges']} edges")
-        agent = HybridRAGAgent(vs, kg)
+        with timer.phase("agent"):
+            cache = RetrievalCache(
+                max_entries=RETRIEVAL_CACHE_SIZE,
+                ttl_seconds=RETRIEVAL_CACHE_TTL,
+                similarity_threshold=SEMANTIC_CACHE_THRESHOLD
+            )
+            response_cache = (ResponseCache(RESPONSE_CACHE_PATH,
+                                            max_disk_entries=RESPONSE_CACHE_SIZE,
+                                            ttl_seconds=RESPONSE_CACHE_TTL)
+                              if RESPONSE_CACHE_PATH else None)
+            reranker = (CrossEncoderReranker(max_candidates=RERANK_CANDIDATES)
+                        if RERANKER_ENABLED else None)
+            agent = HybridRAGAgent(vs, kg, retrieval_cache=cache,
+                                   vector_timeout=VECTOR_TIMEOUT, graph_timeout=GRAPH_TIMEOUT,
+                                   reranker=reranker, context_token_budget=CONTEXT_TOKEN_BUDGET,
+                                   response_cache=response_cache, lexical_index=lexical_index)
+            if METRICS_PORT:
+                get_metrics().serve(METRICS_PORT)
+                print(f"📈 Metrics at http://localhost:{METRICS_PORT}/metrics")
         print("✅ System initialization complete!")
-        return agent
+        return agent, timer.report()
     except Exception as e:
         print(f"❌ System initialization error: {e}")
         st.error(f"System initialization failed: {str(e)}")
-        return None
+        return None, None
 
-def display_source_details(vector_results, graph_results, query, route, message_idx=0):
+def display_source_details(vector_results, graph_results, query, route, message_idx=0,
+                           timings=None, lexical_results=None):
     """Display detailed source breakdown in expandable sections"""
     if not DEBUG_MODE:
         return
@@ -74,6 +143,21 @@ def display_source_details(vector_results, graph_results, query, route, message_
             else:
                 st.warning("❌ No entity relationships found")
 
+        if lexical_results:
+            st.subheader("🔤 BM25 Keyword Matches")
+            for i, result in enumerate(lexical_results[:3], 1):
+                preview = result[:300].replace('\n', ' ').strip()
+                st.text_area(
+                    f"Keyword Match {i}",
+                    preview + "...",
+                    height=100,
+                    key=f"lexical_{i}_{message_idx}_{unique_id}"
+                )
+
+        if timings:
+            st.subheader("⏱️ Stage Timings (ms)")
+            st.json(timings)
+
 def main():
     st.title("🏥 Medical Knowledge Assistant")
     
@@ -94,7 +178,7 @@ def main():
         pass
 
     # Initialize system
-    agent = initialize_system_cached()
+    agent, startup_report = initialize_system_cached()
     if agent is None:
         st.error("❌ System could not be initialized.")
         st.stop()
@@ -159,6 +243,23 @@ def main():
             st.session_state.session_counter = 0
             st.rerun()
 
+        if DEBUG_MODE and agent.retrieval_cache is not None:
+            st.divider()
+            st.caption("🗃️ Retrieval cache")
+            st.json(agent.retrieval_cache.stats())
+
+        if DEBUG_MODE and agent.response_cache is not None:
+            st.caption("💬 Response cache")
+            st.json(agent.response_cache.stats())
+
+        if DEBUG_MODE and agent.metrics.summary():
+            st.caption("📈 Stage latency (ms, bucket upper bounds)")
+            st.json(agent.metrics.summary())
+
+        if DEBUG_MODE and startup_report is not None:
+            st.caption("⏱️ Startup time (seconds)")
+            st.json(startup_report)
+
     # Initialize current session messages
     if not st.session_state.current_session["messages"]:
         st.session_state.current_session["messages"] = [{
@@ -178,7 +279,9 @@ def main():
                 message["source_details"]["graph_results"],
                 message["source_details"]["query"],
                 message["source_details"]["route"],
-                idx
+                idx,
+                message["source_details"].get("timings"),
+                message["source_details"].get("lexical_results")
             )
 
     # Chat input
@@ -195,33 +298,47 @@ def main():
 
         # Generate response
         with st.chat_message("assistant"):
-            with st.spinner("🔍 Searching medical knowledge..."):
-                try:
-                    response, source_details = agent.process_query_with_details(prompt)
-                    
-                    # Display comprehensive response
-                    st.markdown(response)
-                    
-                    # Display detailed source breakdown
-                    display_source_details(
-                        source_details["vector_results"],
-                        source_details["graph_results"],
-                        source_details["query"],
-                        source_details["route"],
-                        len(st.session_state.current_session["messages"])
-                    )
-                    
-                    # Store in session with source details
-                    st.session_state.current_session["messages"].append({
-                        "role": "assistant",
-                        "content": response,
-                        "source_details": source_details
-                    })
+            try:
+                events = agent.stream_query_with_details(prompt)
+                with st.spinner("🔍 Searching medical knowledge..."):
+                    _, source_details = next(events)
+
+                final = {}
+                def answer_tokens():
+                    for kind, value in events:
+                        if kind == "token":
+                            yield value
+                        elif kind == "done":
+                            final["answer"] = value
+
+                # Display comprehensive response as tokens arrive
+                st.write_stream(answer_tokens())
+                response = final["answer"]
                     
-                except Exception as e:
-                    error_msg = f"❌ Error: {str(e)}\n\nPlease try again or rephrase your question."
-                    st.error(error_msg)
-                    st.session_state.current_session["messages"].append({"role": "assistant", "content": error_msg})
+                # Display detailed source breakdown
+                display_source_details(
+                    source_details["vector_results"],
+                    source_details["graph_results"],
+                    source_details["query"],
+                    source_details["route"],
+                    len(st.session_state.current_session["messages"]),
+                    source_details.get("timings"),
+                    source_details.get("lexical_results")
+                )
+                if METRICS_FILE:
+                    agent.metrics.write(METRICS_FILE)
+                
+                # Store in session with source details
+                st.session_state.current_session["messages"].append({
+                    "role": "assistant",
+                    "content": response,
+                    "source_details": source_details
+                })
+                
+            except Exception as e:
+                error_msg = f"❌ Error: {str(e)}\n\nPlease try again or rephrase your question."
+                st.error(error_msg)
+                st.session_state.current_session["messages"].append({"role": "assistant", "content": error_msg})
 
 if __name__ == "__main__":
     main()
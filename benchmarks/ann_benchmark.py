@@ -0,0 +1,105 @@
+"""Compare FAISS index types: recall@k against flat, p50/p99 latency and memory.
+
+    python benchmarks/ann_benchmark.py --persist-dir faiss_vectorstore
+    python benchmarks/ann_benchmark.py --synthetic 100000 --params '{"ivf_flat": {"nprobe": 32}}'
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.ann_index import INDEX_TYPES, build_index, extract_vectors
+
+
+def synthetic_vectors(count, dim=384, clusters=200, seed=0):
+    """Clustered Gaussian vectors, closer to sentence embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    return centers[labels] + 0.3 * rng.normal(size=(count, dim)).astype(np.float32)
+
+
+def load_vectors(args):
+    if args.synthetic:
+        return synthetic_vectors(args.synthetic)
+    index = faiss.read_index(os.path.join(args.persist_dir, "index.faiss"))
+    return extract_vectors(index)
+
+
+def make_queries(vectors, count, seed=1):
+    # Perturbed corpus vectors: queries land near real chunks, as user questions do
+    rng = np.random.default_rng(seed)
+    rows = vectors[rng.choice(len(vectors), count, replace=False)]
+    noise = rng.normal(scale=0.05 * float(np.std(vectors)), size=rows.shape)
+    return (rows + noise).astype(np.float32)
+
+
+def run(index, queries, k):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(ids[0])
+    return np.array(results), np.array(latencies)
+
+
+def recall_at_k(results, truth):
+    k = truth.shape[1]
+    hits = [len(set(r.tolist()) & set(t.tolist())) for r, t in zip(results, truth)]
+    return float(np.mean(hits)) / k
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--persist-dir", default="faiss_vectorstore")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="benchmark N synthetic vectors instead of a saved index")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--params", default="{}", help="JSON of per-type parameter overrides")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    queries = make_queries(vectors, min(args.queries, len(vectors)))
+    overrides = json.loads(args.params)
+    print(f"📊 {len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    truth = None
+    rows = []
+    for index_type in ["flat"] + [t for t in args.types.split(",") if t != "flat"]:
+        started = time.perf_counter()
+        index, params = build_index(vectors, index_type, overrides.get(index_type))
+        build_seconds = time.perf_counter() - started
+        results, latencies = run(index, queries, args.k)
+        if truth is None:
+            truth = results
+        rows.append({
+            "index_type": index_type,
+            "params": params,
+            "build_seconds": round(build_seconds, 3),
+            f"recall@{args.k}": round(recall_at_k(results, truth), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+            "memory_mb": round(len(faiss.serialize_index(index)) / 2**20, 2),
+        })
+
+    print(f"{'type':<10}{'build s':>10}{'recall@' + str(args.k):>12}{'p50 ms':>10}{'p99 ms':>10}{'MB':>10}")
+    for row in rows:
+        print(f"{row['index_type']:<10}{row['build_seconds']:>10}{row[f'recall@{args.k}']:>12}"
+              f"{row['p50_ms']:>10}{row['p99_ms']:>10}{row['memory_mb']:>10}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "k": args.k, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compare two run_suite.py result files and flag regressions.
+
+    python benchmarks/compare_results.py baseline.json results.json --threshold 0.15
+
+Latency, duration and size metrics (``*_ms``, ``*_seconds``, ``*_mb``) regress when
+they grow; throughput and recall (``*_per_sec``, ``recall``) regress when they drop.
+Exits with status 1 if any metric regressed by more than ``--threshold``.
+"""
+import argparse
+import json
+import sys
+
+# Fields that identify a row rather than measure it
+ROW_KEYS = ("scale", "index_type")
+LOWER_IS_BETTER = ("_ms", "_seconds", "_mb")
+HIGHER_IS_BETTER = ("_per_sec", "recall")
+# Differences below these are timer noise, whatever the relative change
+ABSOLUTE_NOISE = {"_ms": 0.05, "_seconds": 0.005, "_mb": 0.01}
+
+
+def direction(metric):
+    """+1 if higher is better, -1 if lower is better, None for non-metrics"""
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return None
+
+
+def flatten(report):
+    """{(section, row key, metric): value} for every numeric metric"""
+    values = {}
+    for section, rows in report["results"].items():
+        for row in rows:
+            row_key = tuple((k, row[k]) for k in ROW_KEYS if k in row)
+            for metric, value in row.items():
+                if isinstance(value, dict):
+                    # Nested breakdowns such as end_to_end stage_mean_ms
+                    for name, inner in value.items():
+                        values[(section, row_key, f"{metric}.{name}")] = inner
+                elif metric not in ROW_KEYS and isinstance(value, (int, float)):
+                    values[(section, row_key, metric)] = value
+    return values
+
+
+def compare(baseline, current, threshold):
+    """Returns [(section, row_key, metric, old, new, relative_change, regressed)]"""
+    old_values = flatten(baseline)
+    new_values = flatten(current)
+    rows = []
+    for key in sorted(old_values.keys() & new_values.keys(), key=str):
+        section, row_key, metric = key
+        base_metric = metric.split(".")[0]
+        sign = direction(base_metric)
+        if sign is None:
+            continue
+        old, new = old_values[key], new_values[key]
+        change = (new - old) / abs(old) if old else 0.0
+        noise = next((v for suffix, v in ABSOLUTE_NOISE.items() if base_metric.endswith(suffix)), 0)
+        regressed = sign * change < -threshold and abs(new - old) > noise
+        rows.append((section, row_key, metric, old, new, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative change counted as a regression (0.10 = 10%%)")
+    parser.add_argument("--all", action="store_true", help="print unchanged metrics too")
+    args = parser.parse_args()
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    print(f"📊 {baseline['meta'].get('commit')} -> {current['meta'].get('commit')}")
+
+    rows = compare(baseline, current, args.threshold)
+    regressions = [row for row in rows if row[-1]]
+    for section, row_key, metric, old, new, change, regressed in rows:
+        if not (args.all or regressed or abs(change) > args.threshold):
+            continue
+        label = " ".join(f"{k}={v}" for k, v in row_key)
+        marker = "❌" if regressed else "✅"
+        print(f"{marker} {section:<12}{label:<28}{metric:<32}{old:>12} -> {new:<12}{change:+.1%}")
+
+    if regressions:
+        print(f"❌ {len(regressions)} metrics regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"✅ No regressions beyond {args.threshold:.0%} ({len(rows)} metrics compared)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Resident memory per worker: pickled in-memory docstore vs the mmap chunk store.
+
+    python benchmarks/docstore_memory.py --synthetic 20000
+    python benchmarks/docstore_memory.py --persist-dir faiss_vectorstore --index-type sq_fp16
+
+Writes the same chunks and vectors in both layouts, then loads each one in a
+fresh interpreter (as a Streamlit worker would) and reads /proc/self/status:
+``RssAnon`` is private to that worker, ``RssFile`` is file pages shared by
+every worker that maps the same files. Linux only.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from src.ann_index import build_index, extract_vectors
+from ann_benchmark import make_queries, synthetic_vectors
+from entity_extraction_benchmark import synthetic_chunks
+
+
+def rss_mb():
+    """{"rss", "rss_anon", "rss_file"} in MB from /proc/self/status"""
+    fields = {"VmRSS": "rss", "RssAnon": "rss_anon", "RssFile": "rss_file"}
+    values = {}
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in fields:
+                values[fields[name]] = round(int(value.split()[0]) / 1024, 1)
+    return values
+
+
+def directory_mb(path):
+    return round(sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+                 / 2**20, 2)
+
+
+def load_source(args):
+    """(ids, texts, metadatas, vectors) from a saved store or synthetic data"""
+    if not args.persist_dir:
+        texts = synthetic_chunks(args.synthetic)
+        ids = [f"chunk-{i}" for i in range(len(texts))]
+        return ids, texts, [{"page": i // 4} for i in range(len(texts))], \
+            synthetic_vectors(len(texts), dim=args.dim)
+
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    store = FAISS.load_local(args.persist_dir, DeterministicFakeEmbedding(size=args.dim),
+                             allow_dangerous_deserialization=True)
+    ids = [store.index_to_docstore_id[i] for i in range(store.index.ntotal)]
+    docs = [store.docstore.search(doc_id) for doc_id in ids]
+    return ids, [d.page_content for d in docs], [d.metadata for d in docs], \
+        extract_vectors(store.index)
+
+
+def write_layouts(args, workdir):
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from src.chunk_store import ChunkStore
+
+    ids, texts, metadatas, vectors = load_source(args)
+    documents = {doc_id: Document(page_content=text, metadata=metadata)
+                 for doc_id, text, metadata in zip(ids, texts, metadatas)}
+    embedding = DeterministicFakeEmbedding(size=vectors.shape[1])
+    positions = dict(enumerate(ids))
+
+    layouts = {}
+    for name, index_type in (("pickle_docstore", "flat"), ("mmap_chunk_store", args.index_type)):
+        path = os.path.join(workdir, name)
+        index, _ = build_index(vectors, index_type)
+        docstore = (InMemoryDocstore(dict(documents)) if name == "pickle_docstore"
+                    else ChunkStore.from_documents(path, documents))
+        FAISS(embedding, index, docstore, dict(positions)).save_local(path)
+        layouts[name] = (path, index_type)
+    np.save(os.path.join(workdir, "queries.npy"), make_queries(vectors, args.queries))
+    return layouts, len(ids)
+
+
+def measure(path, queries_file, k):
+    """Runs in the child: load the store, answer the queries, report memory"""
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    import src.chunk_store  # noqa: F401  (unpickling the chunk store needs it importable)
+
+    queries = np.load(queries_file)
+    before = rss_mb()
+    started = time.perf_counter()
+    store = FAISS.load_local(path, DeterministicFakeEmbedding(size=queries.shape[1]),
+                             allow_dangerous_deserialization=True)
+    load_seconds = time.perf_counter() - started
+    loaded = rss_mb()
+
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        store.similarity_search_with_score_by_vector(query.tolist(), k=k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    after = rss_mb()
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "search_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        **{f"{key}_loaded_mb": round(loaded[key] - before[key], 1) for key in before},
+        **{f"{key}_after_search_mb": round(after[key] - before[key], 1) for key in before},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--persist-dir", help="take chunks and vectors from this saved store")
+    parser.add_argument("--synthetic", type=int, default=20000, help="synthetic chunks otherwise")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--index-type", default="sq_fp16", help="vector index for the mmap layout")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        path, queries_file = args.measure.split(os.pathsep)
+        print(json.dumps(measure(path, queries_file, args.k)))
+        return
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        layouts, count = write_layouts(args, workdir)
+        print(f"📊 {count} chunks, {args.queries} queries, k={args.k}")
+        queries_file = os.path.join(workdir, "queries.npy")
+        for name, (path, index_type) in layouts.items():
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--k", str(args.k),
+                 "--measure", os.pathsep.join([path, queries_file])],
+                cwd=ROOT, capture_output=True, text=True, check=True
+            ).stdout
+            rows.append({"layout": name, "index_type": index_type,
+                         "disk_mb": directory_mb(path),
+                         **json.loads(output.strip().splitlines()[-1])})
+
+    print(f"{'layout':<18}{'index':<9}{'disk MB':>9}{'anon MB':>9}{'file MB':>9}"
+          f"{'load s':>8}{'p50 ms':>8}")
+    for row in rows:
+        print(f"{row['layout']:<18}{row['index_type']:<9}{row['disk_mb']:>9}"
+              f"{row['rss_anon_after_search_mb']:>9}{row['rss_file_after_search_mb']:>9}"
+              f"{row['load_seconds']:>8}{row['search_p50_ms']:>8}")
+    saving = rows[0]["rss_anon_after_search_mb"] - rows[1]["rss_anon_after_search_mb"]
+    print(f"✅ Private memory saved per worker: {saving:.1f} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"chunks": count, "results": rows,
+                       "anon_saving_per_worker_mb": round(saving, 1)}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compare embedding backends: batch throughput, concurrent query latency and fp32 parity.
+
+    python benchmarks/embedding_throughput.py --backends fp32,int8,onnx --texts 2000
+    python benchmarks/embedding_throughput.py --threads 16 --queries 800 --json embed.json
+
+Fails if a backend's minimum cosine similarity to fp32 is below PARITY_MIN_COSINE.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.embedding_service import (
+    BACKENDS, EMBEDDING_MODEL, PARITY_MIN_COSINE, EmbeddingService, cosine_parity, load_encoder
+)
+from entity_extraction_benchmark import synthetic_chunks
+
+QUESTIONS = [
+    "What are the symptoms of diabetes?",
+    "How is pneumonia treated?",
+    "What causes high blood pressure?",
+    "Side effects of ibuprofen",
+    "Is fever a sign of malaria?",
+    "What is the treatment for asthma in children?",
+    "How do antibiotics work against bronchitis?",
+    "What are early signs of tuberculosis?",
+]
+
+
+def documents_per_second(service, texts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        service._encode(texts)
+        best = min(best, time.perf_counter() - started)
+    return len(texts) / best
+
+
+def concurrent_queries(service, queries, threads):
+    """Latency of embed_query calls issued from ``threads`` callers at once"""
+    def timed(query):
+        started = time.perf_counter()
+        service.embed_query(query)
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = np.array(list(pool.map(timed, queries)))
+    elapsed = time.perf_counter() - started
+    return len(queries) / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--texts", type=int, default=1000, help="synthetic chunks for batch encoding")
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent query callers")
+    parser.add_argument("--window-ms", type=float, default=5, help="micro-batching window")
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.texts)
+    queries = [QUESTIONS[i % len(QUESTIONS)] + f" ({i})" for i in range(args.queries)]
+    probe = texts[:200] + QUESTIONS
+    print(f"📊 {args.model}: {len(texts)} chunks, {len(queries)} queries from {args.threads} threads")
+
+    reference = None
+    rows = []
+    for backend in ["fp32"] + [b for b in args.backends.split(",") if b != "fp32"]:
+        started = time.perf_counter()
+        service = EmbeddingService(args.model, backend, batch_window_ms=args.window_ms,
+                                   encoder=load_encoder(args.model, backend))
+        load_seconds = time.perf_counter() - started
+
+        vectors = service._encode(probe)
+        if reference is None:
+            reference = vectors
+        parity = cosine_parity(reference, vectors)
+        docs_per_sec = documents_per_second(service, texts, args.repeat)
+        queries_per_sec, latencies = concurrent_queries(service, queries, args.threads)
+        rows.append({
+            "backend": backend,
+            "load_seconds": round(load_seconds, 2),
+            "docs_per_sec": round(docs_per_sec, 1),
+            "queries_per_sec": round(queries_per_sec, 1),
+            "query_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "query_p99_ms": round(float(np.percentile(latencies, 99)), 2),
+            "mean_batch_requests": round(service.stats()["mean_batch_requests"], 2),
+            "min_cosine_vs_fp32": round(float(parity.min()), 5),
+            "mean_cosine_vs_fp32": round(float(parity.mean()), 5),
+        })
+
+    print(f"{'backend':<9}{'docs/s':>10}{'queries/s':>11}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'batch':>7}{'min cos':>10}")
+    for row in rows:
+        print(f"{row['backend']:<9}{row['docs_per_sec']:>10}{row['queries_per_sec']:>11}"
+              f"{row['query_p50_ms']:>9}{row['query_p99_ms']:>9}{row['mean_batch_requests']:>7}"
+              f"{row['min_cosine_vs_fp32']:>10}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "parity_min_cosine": PARITY_MIN_COSINE,
+                       "results": rows}, f, indent=2)
+    failed = [row["backend"] for row in rows if row["min_cosine_vs_fp32"] < PARITY_MIN_COSINE]
+    if failed:
+        print(f"❌ Below the {PARITY_MIN_COSINE} cosine parity tolerance: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
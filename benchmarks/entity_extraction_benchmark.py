@@ -0,0 +1,154 @@
+"""Compare the compiled entity extractor with the original regex loop.
+
+    python benchmarks/entity_extraction_benchmark.py --pdf data/The_GALE_ENCYCLOPEDIA_of_MEDICINE_SECOND.pdf --chunks 2000
+    python benchmarks/entity_extraction_benchmark.py --synthetic 2000
+
+Fails if any chunk yields different entity sets.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.entity_extractor import BASE_VOCABULARY, SUFFIX_RULES, MedicalEntityExtractor
+
+
+def reference_extract(text):
+    """The original KnowledgeGraph.extract_medical_entities"""
+    entities = {"diseases": [], "symptoms": [], "treatments": [], "anatomy": []}
+
+    disease_patterns = [
+        r'\b(diabetes|cancer|hypertension|asthma|arthritis|pneumonia|fever|malaria|tuberculosis)\b',
+        r'\b(covid|corona|influenza|hepatitis|bronchitis|gastritis|dermatitis)\b',
+        r'\b(\w+itis|\w+osis|\w+emia|\w+pathy)\b',
+    ]
+
+    treatment_patterns = [
+        r'\b(insulin|aspirin|antibiotics|chemotherapy|surgery|ibuprofen|acetaminophen|paracetamol)\b',
+        r'\b(treatment|therapy|medicine|medication|drug|remedy)\b',
+        r'\b(\w+mycin|\w+cillin|\w+azole)\b',
+    ]
+
+    symptom_patterns = [
+        r'\b(pain|fever|nausea|fatigue|headache|cough|chills|sweating|vomiting|dizziness)\b',
+        r'\b(high blood pressure|chest pain|shortness of breath|stomach pain|back pain)\b',
+    ]
+
+    text_lower = text.lower()
+    for pattern in disease_patterns:
+        matches = re.findall(pattern, text_lower, re.IGNORECASE)
+        entities["diseases"].extend([m.strip() for m in matches if len(m.strip()) > 2])
+    for pattern in treatment_patterns:
+        matches = re.findall(pattern, text_lower, re.IGNORECASE)
+        entities["treatments"].extend([m.strip() for m in matches if len(m.strip()) > 2])
+    for pattern in symptom_patterns:
+        matches = re.findall(pattern, text_lower, re.IGNORECASE)
+        entities["symptoms"].extend([m.strip() for m in matches if len(m.strip()) > 2])
+    for key in entities:
+        entities[key] = list(set([e.lower().strip() for e in entities[key] if len(e.strip()) > 2]))
+    return entities
+
+
+def synthetic_chunks(count, chunk_size=1000, seed=0):
+    """Encyclopedia-like text mixing vocabulary, suffix words, plurals and punctuation"""
+    rng = random.Random(seed)
+    terms = [t for terms in BASE_VOCABULARY.values() for t in terms]
+    suffix_words = [stem + suffix for stem in ("neur", "nephr", "cardi", "x", "amoxi", "fluc")
+                    for suffix in SUFFIX_RULES]
+    filler = ("the patient may also experience a of and with in is treated by doctors "
+              "when symptoms are severe blood pressure chest").split()
+    words = terms * 2 + suffix_words + filler * 6
+    separators = [" "] * 12 + [", ", ". ", "\n", "-", " (", ") ", "'s "]
+    chunks = []
+    for _ in range(count):
+        parts = []
+        length = 0
+        while length < chunk_size:
+            word = rng.choice(words)
+            if rng.random() < 0.1:
+                word = word.capitalize()
+            if rng.random() < 0.05:
+                word += "s"
+            part = word + rng.choice(separators)
+            parts.append(part)
+            length += len(part)
+        chunks.append("".join(parts)[:chunk_size])
+    return chunks
+
+
+def pdf_chunks(pdf_path, count):
+    from src.ingest import count_pages, parse_page_range
+    chunks = []
+    total_pages = count_pages(pdf_path)
+    page = 0
+    while len(chunks) < count and page < total_pages:
+        for _, _, page_chunks in parse_page_range(pdf_path, page, min(page + 16, total_pages)):
+            chunks.extend(text for text, _ in page_chunks)
+        page += 16
+    return chunks[:count]
+
+
+def normalize(entities):
+    return {key: sorted(values) for key, values in entities.items()}
+
+
+def time_per_chunk(func, chunks, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for chunk in chunks:
+            func(chunk)
+        best = min(best, time.perf_counter() - started)
+    return best / len(chunks) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", default="data/The_GALE_ENCYCLOPEDIA_of_MEDICINE_SECOND.pdf")
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="use N synthetic chunks instead of the PDF")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.synthetic or not os.path.exists(args.pdf):
+        chunks = synthetic_chunks(args.synthetic or args.chunks)
+        source = "synthetic"
+    else:
+        chunks = pdf_chunks(args.pdf, args.chunks)
+        source = args.pdf
+
+    extractor = MedicalEntityExtractor()
+    mismatches = [i for i, chunk in enumerate(chunks)
+                  if normalize(reference_extract(chunk)) != normalize(extractor.extract(chunk))]
+
+    reference_us = time_per_chunk(reference_extract, chunks, args.repeat)
+    compiled_us = time_per_chunk(extractor.extract, chunks, args.repeat)
+    result = {
+        "source": source,
+        "chunks": len(chunks),
+        "mismatched_chunks": len(mismatches),
+        "reference_us_per_chunk": round(reference_us, 1),
+        "compiled_us_per_chunk": round(compiled_us, 1),
+        "speedup": round(reference_us / compiled_us, 2),
+    }
+    print(f"📊 {len(chunks)} chunks from {source}")
+    print(f"  regex loop: {result['reference_us_per_chunk']} µs/chunk")
+    print(f"  compiled:   {result['compiled_us_per_chunk']} µs/chunk ({result['speedup']}x)")
+    print(f"  identical entity sets: {len(chunks) - len(mismatches)}/{len(chunks)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if mismatches:
+        print(f"❌ First mismatching chunk: {mismatches[0]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
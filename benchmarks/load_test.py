@@ -0,0 +1,192 @@
+"""Throughput of the query server (src/server.py) as the worker count grows.
+
+    python benchmarks/load_test.py --workers 1,2,4,8 --concurrency 32 --requests 500
+    python benchmarks/load_test.py --url http://localhost:8000 --real-llm
+
+For each worker count a server is started over the faiss_vectorstore and
+knowledge_graph.kgb in ``--data-dir``, with the offline fake LLM unless
+``--real-llm``, so the numbers measure retrieval and serving rather than the
+Groq API. Retrieval and response caches are disabled unless ``--cache``. Requests come from
+``--concurrency`` client threads; the table reports throughput, latency
+percentiles and the server's memory (RSS counts shared pages once per
+process, PSS splits them between the processes that share them).
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from src.batch_runner import read_questions
+from src.client import RemoteAgent
+from src.metrics import MetricsRegistry
+
+
+def load_questions(args):
+    if args.questions:
+        questions = [question for _, question in read_questions(args.questions)]
+    else:
+        # run_suite imports the graph and FAISS modules; only needed for generated questions
+        from run_suite import questions_for, read_json
+
+        questions = questions_for(read_json(os.path.join(ROOT, "medical_relations.json")),
+                                  args.requests)
+    return [questions[i % len(questions)] for i in range(args.requests)]
+
+
+def process_memory_mb(pid):
+    """{"rss", "pss"} in MB for ``pid`` and its children (Linux only)"""
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r", encoding="utf-8") as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        return {}
+    totals = {"rss": 0, "pss": 0}
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/smaps_rollup", "r", encoding="utf-8") as f:
+                for line in f:
+                    name, _, value = line.partition(":")
+                    if name in ("Rss", "Pss"):
+                        totals[name.lower()] += int(value.split()[0])
+        except OSError:
+            continue
+    return {f"{name}_mb": round(kb / 1024, 1) for name, kb in totals.items()}
+
+
+def wait_until_ready(agent, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            return agent.health()
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"Server not ready after {timeout}s")
+
+
+def start_server(args, workers, port):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    if not args.cache:
+        env.update(RETRIEVAL_CACHE_SIZE="0", RESPONSE_CACHE_PATH="")
+    command = [sys.executable, "-m", "src.server", "--port", str(port),
+               "--workers", str(workers), "--host", "127.0.0.1"]
+    if not args.real_llm:
+        command.append("--fake-llm")
+    return subprocess.Popen(command, cwd=args.data_dir, env=env, stdout=subprocess.DEVNULL)
+
+
+def run_load(agent, questions, concurrency, stream):
+    """Fire every question from ``concurrency`` threads; returns (latencies_ms, errors, seconds)"""
+    errors = []
+    lock = threading.Lock()
+
+    def one(question):
+        started = time.perf_counter()
+        try:
+            if stream:
+                details = None
+                for kind, value in agent.stream_query_with_details(question):
+                    if kind == "details":
+                        details = value
+            else:
+                _, details = agent.process_query_with_details(question)
+            if details["route"] == "error":
+                raise RuntimeError("agent error")
+        except Exception as e:
+            with lock:
+                errors.append(repr(e))
+            return None
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [ms for ms in pool.map(one, questions) if ms is not None]
+    return latencies, errors, time.perf_counter() - started
+
+
+def measure(args, agent, questions, workers, server_pid=None):
+    # Warm every worker (model buffers, per-process caches) before timing
+    run_load(agent, questions[:args.concurrency * 2], args.concurrency, args.stream)
+    latencies, errors, seconds = run_load(agent, questions, args.concurrency, args.stream)
+    row = {"workers": workers, "requests": len(questions), "errors": len(errors),
+           "throughput_per_sec": round(len(latencies) / seconds, 2)}
+    if latencies:
+        row.update({f"p{q}_ms": round(float(np.percentile(latencies, q)), 2)
+                    for q in (50, 95, 99)})
+    if server_pid is not None:
+        row.update(process_memory_mb(server_pid))
+    if errors:
+        print(f"  ⚠️ {len(errors)} failed requests, e.g. {errors[0]}")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    parser.add_argument("--data-dir", default=ROOT,
+                        help="directory holding faiss_vectorstore and knowledge_graph.kgb")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--questions", help="JSONL questions file (default: from the relations)")
+    parser.add_argument("--stream", action="store_true", help="use the streaming endpoint")
+    parser.add_argument("--real-llm", action="store_true", help="keep the server's Groq LLM")
+    parser.add_argument("--cache", action="store_true", help="keep retrieval/response caches on")
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    questions = load_questions(args)
+    rows = []
+    if args.url:
+        agent = RemoteAgent(args.url, metrics=MetricsRegistry())
+        health = wait_until_ready(agent, None, args.startup_timeout)
+        rows.append(measure(args, agent, questions, "?"))
+        print(f"📊 {args.url}: {health['vectors']} vectors, {health['graph_nodes']} graph nodes")
+    else:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            process = start_server(args, workers, args.port)
+            try:
+                agent = RemoteAgent(f"http://127.0.0.1:{args.port}", metrics=MetricsRegistry())
+                wait_until_ready(agent, process, args.startup_timeout)
+                print(f"🚀 {workers} workers ready")
+                rows.append(measure(args, agent, questions, workers, process.pid))
+            finally:
+                process.send_signal(signal.SIGTERM)
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+
+    print(f"\n{'workers':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'errors':>8}{'RSS MB':>9}{'PSS MB':>9}{'speedup':>9}")
+    base = rows[0]["throughput_per_sec"] or None
+    for row in rows:
+        speedup = f"{row['throughput_per_sec'] / base:.2f}x" if base else "-"
+        print(f"{row['workers']:>8}{row['throughput_per_sec']:>9}{row.get('p50_ms', '-'):>9}"
+              f"{row.get('p95_ms', '-'):>9}{row.get('p99_ms', '-'):>9}{row['errors']:>8}"
+              f"{row.get('rss_mb', '-'):>9}{row.get('pss_mb', '-'):>9}{speedup:>9}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"concurrency": args.concurrency, "stream": args.stream,
+                       "fake_llm": not args.real_llm, "cache": args.cache, "results": rows},
+                      f, indent=2)
+        print(f"💾 Saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Offline CPU benchmark suite over synthetic data scaled from medical_relations.json.
+
+    python benchmarks/run_suite.py --scales 1,10,100 --json results.json
+    python benchmarks/run_suite.py --only graph_query,graph_load --scales 1,10
+    python benchmarks/compare_results.py baseline.json results.json
+
+Sections:
+
+- ``startup``: cold import time of the app modules in a fresh interpreter
+- ``graph_query``: ``query_graph`` latency vs node count, including the first query after load
+- ``graph_load``: ``build_graph_from_pdf`` with a persisted graph, vs unpickling networkx
+- ``extraction``: ``extract_medical_entities`` throughput with the scaled vocabulary
+- ``faiss``: search latency and recall per index type
+- ``end_to_end``: ``process_query_with_details`` with fake embeddings and a stub LLM
+
+Every generator is seeded, so two runs on the same commit see identical inputs.
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from src.ann_index import INDEX_TYPES, build_index
+from src.graph_store import save_graph, save_manifest
+from src.knowledge_graph import KnowledgeGraph
+from ann_benchmark import make_queries, recall_at_k, run, synthetic_vectors
+from entity_extraction_benchmark import synthetic_chunks
+
+SECTIONS = ("startup", "graph_query", "graph_load", "extraction", "faiss", "end_to_end")
+QUALIFIERS = ("acute", "chronic", "juvenile", "viral", "bacterial", "hereditary", "adult",
+              "severe", "mild", "recurrent", "congenital", "secondary", "primary", "atypical")
+QUESTION_TEMPLATES = (
+    "What are the symptoms of {}?",
+    "How is {} treated?",
+    "What causes {}?",
+    "Tell me about {}",
+)
+STARTUP_IMPORTS = "import src.hybrid_agent, src.knowledge_graph, src.vector_store"
+
+
+def summarize(latencies_ms):
+    latencies = np.asarray(latencies_ms)
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+        "mean_ms": round(float(latencies.mean()), 4),
+    }
+
+
+def variant_names(name, count):
+    """``count`` distinct entity names derived from ``name``, the original first"""
+    names = [name] + [f"{q} {name}" for q in QUALIFIERS]
+    n = 2
+    while len(names) < count:
+        names += [f"{q} {name} type {n}" for q in ("",) + QUALIFIERS]
+        n += 1
+    return [" ".join(v.split()) for v in names[:count]]
+
+
+def synthetic_relations(scale, base_file=os.path.join(ROOT, "medical_relations.json"), seed=0):
+    """The relations file repeated ``scale`` times under qualified entity names.
+
+    Targets are renamed the same way, so node and edge counts both grow
+    roughly linearly, and entity names keep a realistic length and word count.
+    """
+    with open(base_file, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    rng = random.Random(seed)
+    variants = {}
+    relations = {}
+    for entity, entity_relations in base.items():
+        for i, name in enumerate(variant_names(entity, scale)):
+            relations[name] = {}
+            for rel_type, targets in entity_relations.items():
+                if not isinstance(targets, list):
+                    continue
+                for target in targets:
+                    if target not in variants:
+                        variants[target] = variant_names(target, scale)
+                # Variant i links to targets of the same or a more general variant
+                relations[name][rel_type] = [variants[t][rng.randrange(i + 1)] for t in targets]
+    return relations
+
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def questions_for(relations, count, seed=0):
+    rng = random.Random(seed)
+    entities = sorted(relations)
+    questions = [rng.choice(QUESTION_TEMPLATES).format(rng.choice(entities))
+                 for _ in range(count)]
+    # A few questions with no matching entity, as in real traffic
+    questions[::10] = ["What is a healthy breakfast?"] * len(questions[::10])
+    return questions
+
+
+def build_graph(relations_file):
+    kg = KnowledgeGraph()
+    started = time.perf_counter()
+    kg.load_external_relations(relations_file)
+    return kg, time.perf_counter() - started
+
+
+def bench_startup(args, workdir):
+    seconds = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", STARTUP_IMPORTS], cwd=ROOT, check=True)
+        seconds.append(time.perf_counter() - started)
+    return [{"imports_seconds": round(min(seconds), 3),
+             "imports_median_seconds": round(float(np.median(seconds)), 3)}]
+
+
+def bench_graph_query(args, workdir, scale, relations_file):
+    kg, build_seconds = build_graph(relations_file)
+    questions = questions_for(read_json(relations_file), args.queries)
+    started = time.perf_counter()
+    kg.query_graph(questions[0])
+    first_ms = (time.perf_counter() - started) * 1000
+    for question in questions:   # warm the per-node caches
+        kg.query_graph(question)
+    latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        kg.query_graph(question)
+        latencies.append((time.perf_counter() - started) * 1000)
+    stats = kg.get_graph_stats()
+    return {"scale": scale, "nodes": stats["nodes"], "edges": stats["edges"],
+            "build_seconds": round(build_seconds, 3), "hot_entities": stats["hot_entities"],
+            "first_query_ms": round(first_ms, 3),
+            **summarize(latencies)}
+
+
+def bench_graph_load(args, workdir, scale, relations_file):
+    kg, _ = build_graph(relations_file)
+    graph_file = os.path.join(workdir, f"graph_{scale}.kgb")
+    pickle_file = os.path.join(workdir, f"graph_{scale}.pkl")
+    save_graph(kg.graph, graph_file)
+    save_manifest(graph_file, kg.manifest)
+    with open(pickle_file, "wb") as f:
+        pickle.dump(kg.graph, f)
+
+    load_seconds, first_query_ms = [], []
+    question = questions_for(read_json(relations_file), 2)[1]
+    for _ in range(args.repeat):
+        loaded = KnowledgeGraph()
+        started = time.perf_counter()
+        loaded.build_graph_from_pdf("unused.pdf", persist_file=graph_file,
+                                    legacy_pickle=os.path.join(workdir, "missing.pkl"),
+                                    relations_files=(relations_file,))
+        load_seconds.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        loaded.query_graph(question)
+        first_query_ms.append((time.perf_counter() - started) * 1000)
+
+    pickle_seconds = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        with open(pickle_file, "rb") as f:
+            pickle.load(f)
+        pickle_seconds.append(time.perf_counter() - started)
+
+    return {"scale": scale, "nodes": kg.graph.number_of_nodes(),
+            "file_mb": round(os.path.getsize(graph_file) / 2**20, 2),
+            "load_seconds": round(min(load_seconds), 4),
+            "first_query_ms": round(min(first_query_ms), 3),
+            "pickle_load_seconds": round(min(pickle_seconds), 4)}
+
+
+def bench_extraction(args, workdir, scale, relations_file):
+    kg = KnowledgeGraph()
+    started = time.perf_counter()
+    kg.refresh_entity_vocabulary((relations_file,))
+    compile_seconds = time.perf_counter() - started
+    chunks = synthetic_chunks(args.chunks)
+    best = float("inf")
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        for chunk in chunks:
+            kg.extract_medical_entities(chunk)
+        best = min(best, time.perf_counter() - started)
+    return {"scale": scale, "vocabulary": kg.entity_extractor.vocabulary_size,
+            "compile_seconds": round(compile_seconds, 3),
+            "chunks_per_sec": round(len(chunks) / best, 1),
+            "mb_per_sec": round(sum(map(len, chunks)) / best / 2**20, 3)}
+
+
+def bench_faiss(args, workdir, scale, relations_file):
+    vectors = synthetic_vectors(args.vectors * scale, dim=args.dim)
+    queries = make_queries(vectors, min(args.queries, len(vectors)))
+    rows = []
+    truth = None
+    for index_type in ["flat"] + [t for t in args.index_types.split(",") if t != "flat"]:
+        started = time.perf_counter()
+        index, _ = build_index(vectors, index_type)
+        build_seconds = time.perf_counter() - started
+        results, latencies = run(index, queries, args.k)
+        if truth is None:
+            truth = results
+        rows.append({"scale": scale, "index_type": index_type, "vectors": len(vectors),
+                     "build_seconds": round(build_seconds, 3),
+                     "recall": round(recall_at_k(results, truth), 4), **summarize(latencies)})
+    return rows
+
+
+class StubLLM:
+    """Deterministic offline stand-in for ChatGroq"""
+    model_name = "stub"
+    temperature = 0
+
+    def __init__(self, answer="• Point 1\n\n• Point 2"):
+        self.answer = answer
+
+    def invoke(self, prompt):
+        from langchain_core.messages import AIMessage
+        return AIMessage(content=self.answer)
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+
+def bench_end_to_end(args, workdir, scale, relations_file):
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from src.hybrid_agent import HybridRAGAgent
+    from src.metrics import MetricsRegistry
+
+    kg, _ = build_graph(relations_file)
+    chunks = synthetic_chunks(args.chunks * scale)
+    vectorstore = FAISS.from_texts(chunks, DeterministicFakeEmbedding(size=args.dim))
+    agent = HybridRAGAgent(vectorstore, kg, llm=StubLLM(), metrics=MetricsRegistry())
+    questions = questions_for(read_json(relations_file), args.queries)
+
+    agent.process_query_with_details(questions[0])
+    latencies = []
+    stages = {}
+    for question in questions:
+        started = time.perf_counter()
+        _, details = agent.process_query_with_details(question)
+        latencies.append((time.perf_counter() - started) * 1000)
+        for stage, value in details.get("timings", {}).items():
+            stages.setdefault(stage, []).append(value)
+    return {"scale": scale, "chunks": len(chunks), "nodes": kg.graph.number_of_nodes(),
+            **summarize(latencies),
+            "stage_mean_ms": {stage: round(float(np.mean(v)), 4) for stage, v in stages.items()}}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1,10,100",
+                        help="multiples of medical_relations.json (and of --vectors/--chunks)")
+    parser.add_argument("--only", default=",".join(SECTIONS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=200, help="text chunks at scale 1")
+    parser.add_argument("--vectors", type=int, default=1000, help="FAISS vectors at scale 1")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--index-types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",")]
+    sections = [s for s in args.only.split(",") if s]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections {sorted(unknown)}; expected {SECTIONS}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        relations_files = {}
+        for scale in scales:
+            relations_files[scale] = os.path.join(workdir, f"relations_{scale}.json")
+            with open(relations_files[scale], "w", encoding="utf-8") as f:
+                json.dump(synthetic_relations(scale), f)
+
+        for section in sections:
+            bench = globals()[f"bench_{section}"]
+            print(f"📊 {section}")
+            if section == "startup":
+                rows = bench(args, workdir)
+            else:
+                rows = []
+                for scale in scales:
+                    row = bench(args, workdir, scale, relations_files[scale])
+                    rows.extend(row if isinstance(row, list) else [row])
+            for row in rows:
+                print("  " + ", ".join(f"{k}={v}" for k, v in row.items()
+                                       if not isinstance(v, dict)))
+            results[section] = rows
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Saved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
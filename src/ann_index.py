@@ -0,0 +1,111 @@
+import json
+import math
+import os
+import numpy as np
+import faiss
+
+INDEX_CONFIG_FILE = "index_config.json"
+
+INDEX_TYPES = {
+    "flat": {},
+    # Exact search over vectors stored as float16: half the memory and file size of flat
+    "sq_fp16": {},
+    "ivf_flat": {"nlist": None, "nprobe": 16, "train_size": 50000},
+    "hnsw": {"M": 32, "ef_construction": 200, "ef_search": 64},
+    "ivf_pq": {"nlist": None, "nprobe": 16, "pq_m": 48, "pq_nbits": 8, "train_size": 50000},
+}
+
+# HNSW cannot remove vectors, so updates go through a temporary flat index
+REMOVABLE_TYPES = {"flat", "sq_fp16", "ivf_flat", "ivf_pq"}
+
+
+def resolve_params(index_type, params=None):
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {sorted(INDEX_TYPES)}")
+    resolved = dict(INDEX_TYPES[index_type])
+    resolved.update(params or {})
+    return resolved
+
+
+def _default_nlist(num_vectors):
+    # ~4*sqrt(n) lists, keeping at least 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def build_index(vectors, index_type="flat", params=None):
+    """Build and train a FAISS index of the given type over ``vectors``"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dim = vectors.shape
+    params = resolve_params(index_type, params)
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "sq_fp16":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["M"])
+        index.hnsw.efConstruction = params["ef_construction"]
+    else:
+        params["nlist"] = params["nlist"] or _default_nlist(num_vectors)
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, params["nlist"])
+        else:
+            if dim % params["pq_m"]:
+                raise ValueError(f"pq_m={params['pq_m']} must divide the vector dimension {dim}")
+            index = faiss.IndexIVFPQ(quantizer, dim, params["nlist"],
+                                     params["pq_m"], params["pq_nbits"])
+        rng = np.random.default_rng(0)
+        sample_size = min(num_vectors, params["train_size"])
+        sample = vectors[rng.choice(num_vectors, sample_size, replace=False)]
+        index.train(sample)
+
+    if num_vectors:
+        index.add(vectors)
+    apply_search_params(index, index_type, params)
+    return index, params
+
+
+def apply_search_params(index, index_type, params):
+    if index_type in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+    elif index_type == "hnsw":
+        index.hnsw.efSearch = params["ef_search"]
+
+
+def extract_vectors(index):
+    """Recover the stored vectors (exact for flat, IVF-Flat and HNSW)"""
+    if isinstance(index, (faiss.IndexIVFFlat, faiss.IndexIVFPQ)):
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def load_index_config(persist_dir):
+    path = os.path.join(persist_dir, INDEX_CONFIG_FILE)
+    if not os.path.exists(path):
+        return {"index_type": "flat", "params": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_index_config(persist_dir, config):
+    os.makedirs(persist_dir, exist_ok=True)
+    with open(os.path.join(persist_dir, INDEX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+
+def convert_vectorstore_index(vectorstore, index_type, params=None, current_type="flat"):
+    """Rebuild ``vectorstore.index`` as another index type in place"""
+    if current_type == "ivf_pq" and index_type != "ivf_pq":
+        raise ValueError("IVF-PQ keeps only compressed vectors; rebuild from the PDF to change its type")
+    # Positions are preserved, so index_to_docstore_id stays valid
+    vectors = extract_vectors(vectorstore.index)
+    vectorstore.index, resolved = build_index(vectors, index_type, params)
+    return {"index_type": index_type, "params": resolved}
+
+
+def tune_vectorstore(vectorstore, config, overrides=None):
+    """Apply persisted (or overridden) search-time parameters after loading"""
+    params = dict(config["params"])
+    params.update(overrides or {})
+    apply_search_params(vectorstore.index, config["index_type"], params)
@@ -0,0 +1,106 @@
+"""Offline evaluation runner: answer JSONL questions in batches.
+
+    python -m src.batch_runner questions.jsonl --output answers.jsonl
+
+Each input line is a JSON object with a "question" (or "query") field and an
+optional "id"; each output line adds the answer, route, retrieved context and
+per-stage timings.
+"""
+import argparse
+import json
+import time
+from dotenv import load_dotenv
+
+DEFAULT_PDF_PATH = "data/The_GALE_ENCYCLOPEDIA_of_MEDICINE_SECOND.pdf"
+
+
+def read_questions(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            question = record.get("question") or record.get("query")
+            if not question:
+                raise ValueError(f"{path}:{line_number} has no 'question' field")
+            record.setdefault("id", line_number)
+            yield record, question
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run(agent, input_path, output_path, batch_size=64, max_concurrency=8):
+    total = 0
+    tokens_saved = 0
+    started = time.time()
+    with open(output_path, "w", encoding="utf-8") as out:
+        for batch in batched(read_questions(input_path), batch_size):
+            results = agent.process_queries([q for _, q in batch], max_concurrency=max_concurrency)
+            for (record, question), (answer, details) in zip(batch, results):
+                out.write(json.dumps({
+                    "id": record["id"],
+                    "question": question,
+                    "answer": answer,
+                    "route": details["route"],
+                    "vector_results": details["vector_results"],
+                    "graph_results": details["graph_results"],
+                    "lexical_results": details.get("lexical_results", []),
+                    "context": details.get("context"),
+                    "timings": details["timings"],
+                }, ensure_ascii=False) + "\n")
+                tokens_saved += details.get("context", {}).get("tokens_saved", 0)
+            total += len(batch)
+            elapsed = time.time() - started
+            print(f"  ✅ {total} questions answered ({total / elapsed:.2f} q/sec)")
+    print(f"💾 Saved {total} answers to {output_path} ({tokens_saved} prompt tokens saved)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with HybridRAGAgent")
+    parser.add_argument("input", help="JSONL file with one {'question': ...} per line")
+    parser.add_argument("--output", default="answers.jsonl")
+    parser.add_argument("--pdf", default=DEFAULT_PDF_PATH)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-concurrency", type=int, default=8,
+                        help="maximum concurrent LLM requests")
+    parser.add_argument("--bm25", action="store_true",
+                        help="add BM25 keyword retrieval (src/bm25_index.py)")
+    parser.add_argument("--server", help="send the questions to this query server "
+                                         "(python -m src.server) instead of loading the indexes")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.server:
+        from src.client import RemoteAgent
+        run(RemoteAgent(args.server), args.input, args.output, args.batch_size,
+            args.max_concurrency)
+        return
+
+    # Only a local run needs FAISS, langchain and the PDF loader
+    from src.vector_store import create_vectorstore_from_pdf
+    from src.knowledge_graph import load_or_create_knowledge_graph
+    from src.hybrid_agent import HybridRAGAgent
+
+    vectorstore = create_vectorstore_from_pdf(args.pdf)
+    knowledge_graph = load_or_create_knowledge_graph(args.pdf)
+    lexical_index = None
+    if args.bm25:
+        from src.bm25_index import load_or_build_bm25
+        lexical_index = load_or_build_bm25(vectorstore)
+    agent = HybridRAGAgent(vectorstore, knowledge_graph, lexical_index=lexical_index)
+    run(agent, args.input, args.output, args.batch_size, args.max_concurrency)
+
+
+if __name__ == "__main__":
+    main()
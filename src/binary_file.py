@@ -0,0 +1,97 @@
+"""Framing shared by the memory-mapped binary files (the graph and the BM25 index).
+
+Layout: MAGIC | uint32 version | uint32 header length | JSON header | arrays.
+Each array starts on an ALIGNMENT-byte boundary, and the header records
+its absolute offset and length, so readers ``np.memmap`` it in place.
+Strings are stored as a ``StringTable``: an offsets array plus a UTF-8 blob.
+"""
+import json
+import os
+import struct
+import numpy as np
+
+ALIGNMENT = 64
+
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_arrays(path, magic, version, header, arrays):
+    """Atomically write ``header`` and ``arrays``, a list of (name, ndarray) in file order.
+
+    ``header["arrays"]`` is filled in with each array's offset and length.
+    """
+    header = dict(header, arrays={})
+    # Offsets depend on the header size: lay out again until the header fits before them
+    base = 0
+    while True:
+        offset = base
+        for name, data in arrays:
+            header["arrays"][name] = {"offset": offset, "length": int(data.size)}
+            offset = align(offset + data.nbytes)
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        start = align(len(magic) + 8 + len(header_bytes))
+        if start <= base:
+            break
+        base = start
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(magic)
+        f.write(struct.pack("<II", version, len(header_bytes)))
+        f.write(header_bytes)
+        for name, data in arrays:
+            f.seek(header["arrays"][name]["offset"])
+            f.write(data.tobytes())
+        f.truncate(offset)
+    # Replace atomically so processes still mapping the old file keep a valid view
+    os.replace(tmp_path, path)
+
+
+def read_header(path, magic, max_version, kind):
+    """(version, header) of a file written by ``write_arrays``; ``kind`` names it in errors"""
+    with open(path, "rb") as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError(f"{path} is not a {kind} file")
+        version, header_len = struct.unpack("<II", f.read(8))
+        if version > max_version:
+            raise ValueError(f"Unsupported {kind} format version {version} in {path}")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    return version, header
+
+
+def map_array(path, spec, dtype):
+    """Read-only memmap of the array described by a header ``spec``"""
+    if spec["length"] == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=spec["offset"],
+                     shape=(spec["length"],))
+
+
+def encode_strings(strings):
+    """(offsets, data) arrays of a StringTable over ``strings``"""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+class StringTable:
+    """Sequence of strings as bytes, read lazily from the offsets and the blob.
+
+    Tables written in sorted byte order can be searched with ``bisect``.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[int(self.offsets[i]):int(self.offsets[i + 1])].tobytes()
+
+    def text(self, i):
+        return self[i].decode("utf-8")
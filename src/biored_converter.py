@@ -1,132 +1,187 @@
+"""Streaming BioRED (BioC JSON) to medical relations converter.
+
+Each Train/Dev/Test file is parsed incrementally with ijson in its own worker
+process, one document at a time. Relations are deduplicated as they are
+found and written as JSON Lines, one relation per line:
+
+    {"entity": "aspirin", "relation": "treatments", "target": "fever"}
+
+Only hashes of the relations already written are kept in memory, so memory
+does not grow with the number of documents. The knowledge graph loader reads
+``.jsonl`` relation files line by line (see ``iter_relations``).
+
+    python -m src.biored_converter --out medical_relations.jsonl --workers 3
+"""
+import argparse
+import hashlib
 import json
 import os
-from collections import defaultdict
-
-def convert_biored_to_medical_relations():
-    """Fixed BioRED dataset to medical relations converter"""
-    medical_relations = defaultdict(lambda: {
-        'symptoms': [],
-        'treatments': [],
-        'causes': [],
-        'related_to': []
-    })
-
-    # Check BioRED files
-    biored_files = []
-    possible_files = [
-        'BIORED/Train.BioC.JSON',
-        'BIORED/Dev.BioC.JSON', 
-        'BIORED/Test.BioC.JSON'
-    ]
-
-    for file_path in possible_files:
-        if os.path.exists(file_path):
-            biored_files.append(file_path)
-            print(f"✅ Found: {file_path}")
-
-    if not biored_files:
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BIORED_FILES = (
+    "BIORED/Train.BioC.JSON",
+    "BIORED/Dev.BioC.JSON",
+    "BIORED/Test.BioC.JSON",
+)
+RELATIONS_OUTPUT = "medical_relations.jsonl"
+
+
+def iter_relations(relations_file):
+    """Yield (entity, relation, target) from a relations file.
+
+    ``.jsonl`` files (this converter's output) are streamed line by line;
+    other files are the ``{entity: {relation: [targets]}}`` JSON document.
+    """
+    with open(relations_file, "r", encoding="utf-8") as f:
+        if relations_file.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["entity"], record["relation"], record["target"]
+            return
+        relations = json.load(f)
+    for entity, entity_relations in relations.items():
+        for rel_type, targets in entity_relations.items():
+            if isinstance(targets, list):
+                for target in targets:
+                    yield entity, rel_type, target
+
+
+def categorize(rel_type, entity1, entity2):
+    """Map a BioRED relation onto (entity, relation, target)"""
+    if any(keyword in rel_type for keyword in ['treat', 'therapy', 'drug']):
+        return entity1, 'treatments', entity2
+    if any(keyword in rel_type for keyword in ['cause', 'induce']):
+        return entity2, 'causes', entity1
+    if any(keyword in rel_type for keyword in ['symptom', 'sign']):
+        return entity1, 'symptoms', entity2
+    return entity1, 'related_to', entity2
+
+
+def document_relations(doc):
+    """(entity, relation, target) triples of one BioC document"""
+    # Build entity ID to name mapping
+    entity_map = {}
+    for passage in doc.get('passages', []):
+        for annotation in passage.get('annotations', []):
+            entity_id = annotation.get('id')
+            entity_text = (annotation.get('text') or '').lower().strip()
+            if entity_id and entity_text and len(entity_text) > 2:
+                entity_map[entity_id] = entity_text
+
+    for relation in doc.get('relations', []):
+        infons = relation.get('infons') or {}
+        entity1_name = entity_map.get(infons.get('entity1', ''), '')
+        entity2_name = entity_map.get(infons.get('entity2', ''), '')
+        if not entity1_name or not entity2_name:
+            continue
+        rel_type = str(infons.get('type') or 'related_to').lower()
+        yield categorize(rel_type, entity1_name, entity2_name)
+
+
+def relation_hash(entity, relation, target):
+    # 8 bytes per relation instead of the strings; collisions are negligible below ~10^8
+    digest = hashlib.blake2b(f"{entity}\x1f{relation}\x1f{target}".encode("utf-8"),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def convert_file(file_path, part_path):
+    """Stream one BioC file into a JSONL part; returns per-file counts"""
+    import ijson
+
+    started = time.perf_counter()
+    seen = set()
+    documents = relations = 0
+    with open(file_path, "rb") as f, open(part_path, "w", encoding="utf-8") as out:
+        # BioC JSON structure: documents live under the top-level 'documents' key
+        for doc in ijson.items(f, "documents.item"):
+            documents += 1
+            for entity, relation, target in document_relations(doc):
+                relations += 1
+                key = relation_hash(entity, relation, target)
+                if key in seen:
+                    continue
+                seen.add(key)
+                out.write(json.dumps({"entity": entity, "relation": relation, "target": target},
+                                     ensure_ascii=False) + "\n")
+    return {"file": file_path, "documents": documents, "relations": relations,
+            "unique": len(seen), "seconds": round(time.perf_counter() - started, 2)}
+
+
+def convert_biored_to_medical_relations(biored_files=BIORED_FILES, output_file=RELATIONS_OUTPUT,
+                                        workers=None):
+    """Convert the BioRED files in parallel into one deduplicated JSONL relations file.
+
+    Returns the totals, or {} when no BioRED file was found.
+    """
+    found = [path for path in biored_files if os.path.exists(path)]
+    for path in found:
+        print(f"✅ Found: {path}")
+    if not found:
         print("❌ No BioRED files found!")
         return {}
 
-    total_relations = 0
-    total_documents = 0
-
-    for file_path in biored_files:
-        try:
-            print(f"📊 Processing {file_path}...")
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            # BioC JSON structure: data should have 'documents' key
-            documents = data.get('documents', [])
-            if not documents:
-                print(f"⚠️ No documents found in {file_path}")
-                continue
-
-            total_documents += len(documents)
-            print(f"📄 Processing {len(documents)} documents...")
-
-            for doc in documents:
-                # Build entity ID to name mapping
-                entity_map = {}
-                
-                # Check passages for annotations
-                passages = doc.get('passages', [])
-                for passage in passages:
-                    annotations = passage.get('annotations', [])
-                    for annotation in annotations:
-                        entity_id = annotation.get('id')
-                        entity_text = annotation.get('text', '').lower().strip()
-                        if entity_id and entity_text and len(entity_text) > 2:
-                            entity_map[entity_id] = entity_text
-
-                # Process relations
-                relations = doc.get('relations', [])
-                print(f"  Document {doc.get('id', 'unknown')}: Found {len(relations)} relations")
-                
-                for relation in relations:
-                    try:
-                        # Get relation info
-                        infons = relation.get('infons', {})
-                        entity1_id = infons.get('entity1', '')
-                        entity2_id = infons.get('entity2', '')
-                        rel_type = infons.get('type', 'related_to').lower()
-
-                        # Get entity names from mapping
-                        entity1_name = entity_map.get(entity1_id, '').strip()
-                        entity2_name = entity_map.get(entity2_id, '').strip()
-
-                        if not entity1_name or not entity2_name or len(entity1_name) < 2 or len(entity2_name) < 2:
-                            continue
-
-                        # Map relation types to categories
-                        if any(keyword in rel_type for keyword in ['treat', 'therapy', 'drug']):
-                            medical_relations[entity1_name]['treatments'].append(entity2_name)
-                        elif any(keyword in rel_type for keyword in ['cause', 'induce']):
-                            medical_relations[entity2_name]['causes'].append(entity1_name)  
-                        elif any(keyword in rel_type for keyword in ['symptom', 'sign']):
-                            medical_relations[entity1_name]['symptoms'].append(entity2_name)
-                        else:
-                            medical_relations[entity1_name]['related_to'].append(entity2_name)
-
-                        total_relations += 1
-
-                    except Exception as e:
-                        continue
-
-        except Exception as e:
-            print(f"❌ Error processing {file_path}: {e}")
-            continue
-
-    print(f"📈 Total documents processed: {total_documents}")
-    print(f"📈 Total relations processed: {total_relations}")
-
-    # Clean and deduplicate
-    final_relations = {}
-    for entity, relations in medical_relations.items():
-        if any(relations.values()) and len(entity) > 2:
-            cleaned_relations = {}
-            for rel_type, targets in relations.items():
-                if targets:
-                    cleaned_targets = list(set([t for t in targets if t and len(t) > 2]))
-                    if cleaned_targets:
-                        cleaned_relations[rel_type] = cleaned_targets
-            if cleaned_relations:
-                final_relations[entity] = cleaned_relations
-
-    # Save to JSON
-    output_file = 'medical_relations.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(final_relations, f, indent=2, ensure_ascii=False)
-
-    print(f"✅ Extracted {len(final_relations)} entities with relations")
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    parts_dir = tempfile.mkdtemp(prefix="biored-", dir=output_dir)
+    try:
+        parts = [os.path.join(parts_dir, f"part-{i}.jsonl") for i in range(len(found))]
+        workers = min(workers or os.cpu_count() or 1, len(found))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = []
+            for result in pool.map(convert_file, found, parts):
+                print(f"📊 {result['file']}: {result['documents']} documents, "
+                      f"{result['relations']} relations ({result['unique']} unique) "
+                      f"in {result['seconds']}s")
+                results.append(result)
+
+        # Merge the parts, dropping relations already written by another file
+        seen = set()
+        tmp_path = f"{output_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            for part in parts:
+                with open(part, "r", encoding="utf-8") as f:
+                    for line in f:
+                        record = json.loads(line)
+                        key = relation_hash(record["entity"], record["relation"],
+                                            record["target"])
+                        if key not in seen:
+                            seen.add(key)
+                            out.write(line)
+        os.replace(tmp_path, output_file)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    totals = {
+        "files": len(found),
+        "documents": sum(r["documents"] for r in results),
+        "relations": sum(r["relations"] for r in results),
+        "unique_relations": len(seen),
+    }
+    print(f"📈 Total documents processed: {totals['documents']}")
+    print(f"📈 Total relations processed: {totals['relations']}")
+    print(f"✅ Extracted {totals['unique_relations']} unique relations")
     print(f"💾 Saved to {output_file}")
-    
-    return final_relations
+    return totals
 
-if __name__ == "__main__":
-    relations = convert_biored_to_medical_relations()
-    if relations:
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert BioRED BioC JSON into graph relations")
+    parser.add_argument("files", nargs="*", default=list(BIORED_FILES))
+    parser.add_argument("--out", default=RELATIONS_OUTPUT)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if convert_biored_to_medical_relations(args.files, args.out, args.workers):
         print("\n🎯 Sample extracted relations:")
-        for entity, rels in list(relations.items())[:3]:
-            print(f"  {entity}: {rels}")
+        for i, (entity, relation, target) in enumerate(iter_relations(args.out)):
+            if i == 3:
+                break
+            print(f"  {entity} {relation} {target}")
+
+
+if __name__ == "__main__":
+    main()
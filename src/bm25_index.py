@@ -0,0 +1,313 @@
+"""BM25 lexical index over the vector store's chunks, searched with MaxScore pruning.
+
+Exact medical terms ("metformin", "hepatitis b") are often ranked poorly by
+the dense MiniLM search. This index scores them by term statistics instead.
+It is a compact inverted file saved next to the FAISS index
+(``bm25_index.bin``) and memory-mapped on load:
+
+- a sorted term table, binary-searched instead of a per-process dict
+- CSR postings per term: chunk numbers and precomputed BM25 impacts
+- each term's highest impact, the upper bound used for pruning
+- the docstore id of each chunk, in FAISS order
+
+The framing is shared with the graph file (src/binary_file.py). The header
+records a fingerprint of the docstore ids, and ``load_or_build_bm25``
+rebuilds the file whenever the vector store changed or its format is older.
+
+    python -m src.bm25_index faiss_vectorstore "hepatitis b vaccine"
+"""
+import argparse
+import bisect
+import hashlib
+import os
+import re
+import time
+from array import array
+from collections import Counter
+import numpy as np
+from src.binary_file import StringTable, encode_strings, map_array, read_header, write_arrays
+
+MAGIC = b"BM25IDX\x00"
+# Version 2 moved the docstore ids from the JSON header into a string table
+FORMAT_VERSION = 2
+BM25_FILE = "bm25_index.bin"
+K1 = 1.2
+B = 0.75
+# Binary-searching one chunk in a postings list costs about this many sequential postings
+PROBE_COST = 8
+# Letters and digits; "hepatitis B" -> ["hepatitis", "b"]
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset("""
+a about an and are as at be been but by can could do does for from has have how i if in
+into is it its me my of on or should so than that the their them then there these they
+this to was were what when where which who why will with would you your
+""".split())
+
+ARRAYS = [
+    ("term_offsets", "<i8"),
+    ("term_bytes", "u1"),
+    ("indptr", "<i8"),
+    ("postings", "<i4"),
+    ("impacts", "<f4"),
+    ("max_impact", "<f4"),
+    ("doc_id_offsets", "<i8"),
+    ("doc_id_bytes", "u1"),
+]
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def ids_fingerprint(doc_ids):
+    digest = hashlib.sha256()
+    for doc_id in doc_ids:
+        digest.update(str(doc_id).encode("utf-8") + b"\x1f")
+    return digest.hexdigest()
+
+
+def vectorstore_ids(vectorstore):
+    """Docstore ids in FAISS order"""
+    return [vectorstore.index_to_docstore_id[i] for i in range(vectorstore.index.ntotal)]
+
+
+class BM25Index:
+    """Okapi BM25 over an impact-scored inverted index"""
+
+    def __init__(self, header, arrays):
+        self.k1 = header["k1"]
+        self.b = header["b"]
+        self.avgdl = header["avgdl"]
+        self.fingerprint = header["fingerprint"]
+        self.header = header
+        # Plain ndarray views of the memmaps: same pages, without memmap's per-slice overhead
+        arrays = {name: np.asarray(data).view(np.ndarray) for name, data in arrays.items()}
+        self.arrays = arrays
+        self.indptr = arrays["indptr"]
+        self.postings = arrays["postings"]
+        self.impacts = arrays["impacts"]
+        self.max_impact = arrays["max_impact"]
+        self.terms = StringTable(arrays["term_offsets"], arrays["term_bytes"])
+        self.doc_ids = StringTable(arrays["doc_id_offsets"], arrays["doc_id_bytes"])
+
+    @classmethod
+    def build(cls, texts, doc_ids, k1=K1, b=B):
+        """Index ``texts``; ``doc_ids[i]`` (as a string) is returned for ``texts[i]``"""
+        texts, doc_ids = list(texts), [str(doc_id) for doc_id in doc_ids]
+        if len(texts) != len(doc_ids):
+            raise ValueError(f"{len(doc_ids)} ids for {len(texts)} texts")
+        vocabulary = {}
+        term_ids, frequencies, docs = array("i"), array("i"), array("i")
+        lengths = np.zeros(len(doc_ids), dtype=np.float32)
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[doc] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                frequencies.append(tf)
+                docs.append(doc)
+
+        # Terms sorted by their UTF-8 bytes so lookups can binary-search the table
+        terms = sorted(vocabulary, key=lambda t: t.encode("utf-8"))
+        rank = np.empty(len(vocabulary), dtype=np.int64)
+        rank[[vocabulary[t] for t in terms]] = np.arange(len(terms))
+        term_of = rank[np.frombuffer(term_ids, dtype=np.int32)] if terms else \
+            np.zeros(0, dtype=np.int64)
+        # Stable: postings stay in ascending chunk order within each term
+        order = np.argsort(term_of, kind="stable")
+        term_of = term_of[order]
+        postings = np.frombuffer(docs, dtype=np.int32)[order] if terms else \
+            np.zeros(0, dtype=np.int32)
+        tf = np.frombuffer(frequencies, dtype=np.int32)[order].astype(np.float32) if terms else \
+            np.zeros(0, dtype=np.float32)
+
+        n = len(doc_ids)
+        df = np.bincount(term_of, minlength=len(terms))
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+        avgdl = float(lengths.mean()) if n and lengths.mean() > 0 else 1.0
+        # Lucene's non-negative idf
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths[postings] / avgdl)
+        impacts = (idf[term_of] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        max_impact = (np.maximum.reduceat(impacts, indptr[:-1]) if terms
+                      else np.zeros(0, dtype=np.float32))
+
+        term_offsets, term_bytes = encode_strings(terms)
+        doc_id_offsets, doc_id_bytes = encode_strings(doc_ids)
+        arrays = {
+            "term_offsets": term_offsets, "term_bytes": term_bytes,
+            "indptr": indptr, "postings": postings,
+            "impacts": impacts, "max_impact": max_impact,
+            "doc_id_offsets": doc_id_offsets, "doc_id_bytes": doc_id_bytes,
+        }
+        header = {"k1": k1, "b": b, "avgdl": avgdl, "num_terms": len(terms),
+                  "num_postings": int(len(postings)), "fingerprint": ids_fingerprint(doc_ids)}
+        return cls(header, arrays)
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, k1=K1, b=B):
+        """Index the chunks of a LangChain FAISS store (text read from its docstore)"""
+        doc_ids = vectorstore_ids(vectorstore)
+        texts = (vectorstore.docstore.search(doc_id).page_content for doc_id in doc_ids)
+        return cls.build(texts, doc_ids, k1, b)
+
+    def save(self, path):
+        header = {k: v for k, v in self.header.items() if k != "arrays"}
+        write_arrays(path, MAGIC, FORMAT_VERSION, header,
+                     [(name, np.asarray(self.arrays[name]).astype(dtype, copy=False))
+                      for name, dtype in ARRAYS])
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a saved index"""
+        version, header = read_header(path, MAGIC, FORMAT_VERSION, "BM25 index")
+        if version < FORMAT_VERSION:
+            raise ValueError(f"{path} uses the older BM25 index version {version}")
+        arrays = {name: map_array(path, header["arrays"][name], dtype) for name, dtype in ARRAYS}
+        return cls(header, arrays)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def term_id(self, term):
+        """Position of ``term`` in the term table, or None"""
+        key = term.encode("utf-8")
+        i = bisect.bisect_left(self.terms, key)
+        if i < len(self.terms) and self.terms[i] == key:
+            return i
+        return None
+
+    def _contribution(self, term, docs):
+        """Impact of ``term`` for each of ``docs`` (0 where it does not occur)"""
+        start, end = int(self.indptr[term]), int(self.indptr[term + 1])
+        postings = self.postings[start:end]
+        positions = np.searchsorted(postings, docs)
+        inside = positions < len(postings)
+        positions = np.where(inside, positions, 0)
+        found = inside & (postings[positions] == docs)
+        return np.where(found, self.impacts[start:end][positions], 0.0).astype(np.float32)
+
+    @staticmethod
+    def _kth_score(scores, k):
+        """k-th highest of ``scores``, or 0.0 while fewer than k chunks are scored"""
+        if len(scores) < k:
+            return 0.0
+        return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
+    def search(self, query, k=5):
+        """Top ``k`` chunks for ``query`` as [(doc_id, score)], best first.
+
+        Term-at-a-time MaxScore. Terms are taken from the highest upper bound
+        down, and their postings are added into a score accumulator until the
+        bounds of the terms left sum to no more than the current k-th score.
+        A chunk found only in those remaining lists cannot reach the top k, so
+        the long postings of common terms are not scanned. They are only
+        binary-searched for chunks already scored, and a chunk is dropped as
+        soon as its partial score plus the bounds left cannot pass the k-th.
+        """
+        terms = [t for t in (self.term_id(word) for word in dict.fromkeys(tokenize(query)))
+                 if t is not None]
+        if not terms or k <= 0:
+            return []
+        terms.sort(key=lambda t: -float(self.max_impact[t]))
+        bounds = [float(self.max_impact[t]) for t in terms]
+        # remaining[j]: the most a chunk can score from terms[j:]
+        remaining = [sum(bounds[j:]) for j in range(len(terms))] + [0.0]
+
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        lists = []
+        threshold = 0.0
+        while len(lists) < len(terms) and (not lists or remaining[len(lists)] > threshold):
+            term = terms[len(lists)]
+            start, end = int(self.indptr[term]), int(self.indptr[term + 1])
+            postings = self.postings[start:end]
+            # A term's postings hold distinct chunks, so fancy-index += is exact
+            scores[postings] += self.impacts[start:end]
+            lists.append(postings)
+            # Any k distinct scored chunks bound the final k-th score from below
+            threshold = max(threshold, self._kth_score(scores[postings], k))
+        essential = len(lists)
+
+        docs = np.concatenate(lists) if essential > 1 else lists[0]
+        docs = docs[scores[docs] + remaining[essential] >= threshold]
+        if essential > 1:
+            # Deduplicate with a mask: linear, where sorting would not be
+            seen = np.zeros(len(scores), dtype=bool)
+            seen[docs] = True
+            docs = np.flatnonzero(seen)
+        partial = scores[docs]
+        for j in range(essential, len(terms)):
+            keep = partial + remaining[j] >= threshold
+            docs, partial = docs[keep], partial[keep]
+            term = terms[j]
+            start, end = int(self.indptr[term]), int(self.indptr[term + 1])
+            if len(docs) * PROBE_COST > end - start:
+                # Probing would cost more than adding the whole list
+                scores[self.postings[start:end]] += self.impacts[start:end]
+            else:
+                scores[docs] += self._contribution(term, docs)
+            partial = scores[docs]
+            threshold = max(threshold, self._kth_score(partial, k))
+
+        if len(docs) > k:
+            best = np.argpartition(-partial, k - 1)[:k]
+            docs, partial = docs[best], partial[best]
+        order = np.lexsort((docs, -partial))
+        return [(self.doc_ids.text(int(docs[i])), float(partial[i])) for i in order]
+
+    def search_texts(self, query, docstore, k=5):
+        """Like ``search`` but with chunk text: [(text, score)]"""
+        return [(docstore.search(doc_id).page_content, score)
+                for doc_id, score in self.search(query, k)]
+
+    def stats(self):
+        return {"chunks": len(self), "terms": self.header["num_terms"],
+                "postings": self.header["num_postings"], "avgdl": round(self.avgdl, 1)}
+
+
+def load_or_build_bm25(vectorstore, persist_dir="faiss_vectorstore"):
+    """The persisted index for ``vectorstore``, rebuilt if its chunks changed"""
+    path = os.path.join(persist_dir, BM25_FILE)
+    if os.path.exists(path):
+        try:
+            index = BM25Index.load(path)
+        except ValueError as e:
+            print(f"🔁 {e}; rebuilding the BM25 index")
+        else:
+            if index.fingerprint == ids_fingerprint(vectorstore_ids(vectorstore)):
+                print(f"✅ BM25 index loaded: {len(index)} chunks, "
+                      f"{index.header['num_terms']} terms")
+                return index
+            print("🔁 Vector store changed; rebuilding the BM25 index")
+    started = time.perf_counter()
+    BM25Index.from_vectorstore(vectorstore).save(path)
+    index = BM25Index.load(path)
+    print(f"✅ BM25 index built over {len(index)} chunks "
+          f"in {time.perf_counter() - started:.1f}s ({os.path.getsize(path) / 2**20:.1f} MB)")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the BM25 index of a vector store")
+    parser.add_argument("persist_dir", nargs="?", default="faiss_vectorstore")
+    parser.add_argument("query", nargs="?", help="print the top chunks for this query")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    from langchain_community.vectorstores import FAISS
+    from src.embedding_service import get_embeddings
+    import src.chunk_store  # noqa: F401  (unpickling the chunk store needs it importable)
+
+    vectorstore = FAISS.load_local(args.persist_dir, get_embeddings(),
+                                   allow_dangerous_deserialization=True)
+    index = load_or_build_bm25(vectorstore, args.persist_dir)
+    print(f"📊 {index.stats()}")
+    if args.query:
+        for text, score in index.search_texts(args.query, vectorstore.docstore, args.k):
+            preview = text[:120].replace("\n", " ")
+            print(f"  {score:7.3f}  {preview}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+class LRUTTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl_seconds``.
+
+    Pinned entries are kept outside the LRU order: they are never evicted or
+    expired and do not count towards ``max_entries``.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries) + len(self._pinned)
+
+    @property
+    def pinned(self):
+        return len(self._pinned)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._pinned:
+                return self._pinned[key]
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = self.clock() + ttl if ttl else None
+        with self._lock:
+            self._pinned.pop(key, None)
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pin(self, key, value):
+        """Store ``key`` exempt from eviction and expiry until ``unpin``"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._pinned[key] = value
+
+    def unpin(self, key):
+        """Return a pinned entry to the LRU as its most recently used item"""
+        with self._lock:
+            if key not in self._pinned:
+                return
+            value = self._pinned.pop(key)
+        self.put(key, value)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key in self._pinned:
+                return self._pinned.pop(key)
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def items(self):
+        """Live (key, value) pairs, pinned first, then the rest oldest first"""
+        now = self.clock()
+        with self._lock:
+            return list(self._pinned.items()) + [
+                (key, value) for key, (value, expires_at) in self._entries.items()
+                if expires_at is None or expires_at > now]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pinned.clear()
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+
+class RetrievalCache:
+    """Cache of (vector_results, graph_results) per query.
+
+    Lookups first try the normalized query text; when ``similarity_threshold``
+    is set, a miss falls back to the cached query whose embedding has the
+    highest cosine similarity above the threshold.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, similarity_threshold=None,
+                 max_similar_entries=1024):
+        self.exact = LRUTTLCache(max_entries, ttl_seconds)
+        self.similar = LRUTTLCache(max_similar_entries, ttl_seconds) if similarity_threshold else None
+        self.similarity_threshold = similarity_threshold
+        self.fingerprint = None
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def similarity_enabled(self):
+        return self.similar is not None
+
+    def check_fingerprint(self, fingerprint):
+        """Drop every entry when the vector store or graph behind them changed"""
+        if fingerprint != self.fingerprint:
+            if self.fingerprint is not None:
+                self.invalidate()
+            self.fingerprint = fingerprint
+
+    def get(self, query):
+        value = self.exact.get(normalize_query(query))
+        if value is not None:
+            self.hits += 1
+            return value
+        if not self.similarity_enabled:
+            self.misses += 1
+        return None
+
+    def get_similar(self, embedding):
+        """Second-layer lookup, called after an exact miss"""
+        entries = self.similar.items()
+        if entries:
+            matrix = np.stack([vector for _, (vector, _) in entries])
+            scores = matrix @ _unit(embedding)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity_threshold:
+                self.similar_hits += 1
+                return entries[best][1][1]
+        self.misses += 1
+        return None
+
+    def put(self, query, value, embedding=None):
+        key = normalize_query(query)
+        self.exact.put(key, value)
+        if self.similarity_enabled and embedding is not None:
+            self.similar.put(key, (_unit(embedding), value))
+
+    def invalidate(self):
+        self.exact.clear()
+        if self.similar is not None:
+            self.similar.clear()
+        self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "entries": len(self.exact),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else 0.0,
+            "evictions": self.exact.evictions,
+            "expirations": self.exact.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class ResponseCache:
+    """LLM answers keyed by a hash of (model, prompt template version, final prompt).
+
+    Lookups go to an in-memory LRU tier first, then to a SQLite file that
+    survives restarts. Both tiers are size-bounded and entries expire after
+    their TTL. Only deterministic (temperature 0) answers should be stored.
+    """
+
+    def __init__(self, path="response_cache.sqlite", max_entries=1024, max_disk_entries=50000,
+                 ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.memory = LRUTTLCache(max_entries, ttl_seconds)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+
+    @staticmethod
+    def make_key(model, template_version, prompt):
+        payload = "\x1f".join([str(model), str(template_version), prompt])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connection(self):
+        # SQLite connections must not be shared across fork()
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, answer TEXT NOT NULL, "
+                "expires_at REAL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        answer = self.memory.get(key)
+        if answer is not None:
+            self.hits += 1
+            return answer
+
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT answer, expires_at FROM responses WHERE key = ?",
+                               (key,)).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                row = None
+            if row is not None:
+                conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+        if row is None:
+            self.misses += 1
+            return None
+
+        answer, expires_at = row
+        self.disk_hits += 1
+        self.memory.put(key, answer, None if expires_at is None else max(expires_at - now, 0.001))
+        return answer
+
+    def put(self, key, answer, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        self.memory.put(key, answer, ttl)
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                         (key, answer, now + ttl if ttl else None, now))
+            count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_disk_entries:
+                # Drop expired rows first, then the least recently used
+                count -= conn.execute("DELETE FROM responses WHERE expires_at <= ?",
+                                      (now,)).rowcount
+                excess = count - self.max_disk_entries
+                if excess > 0:
+                    conn.execute("DELETE FROM responses WHERE key IN "
+                                 "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                                 (excess,))
+                    self.disk_evictions += excess
+            conn.commit()
+
+    def clear(self):
+        self.memory.clear()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        with self._lock:
+            disk_entries = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "memory_entries": len(self.memory),
+            "disk_entries": disk_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.memory.evictions,
+            "disk_evictions": self.disk_evictions,
+        }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,189 @@
+"""Chunk text kept on disk and read through mmap instead of a pickled in-memory docstore.
+
+``ChunkStore`` replaces LangChain's ``InMemoryDocstore`` behind the FAISS
+vector store. Each chunk is appended to a data file (``chunks.0.bin``) as one
+JSON record and ``chunks.idx.json`` maps its docstore id to (offset, length). Only the records
+of the k returned hits are decoded, and the file pages are shared through the
+OS page cache by every process that maps them.
+
+Pickling a ChunkStore (``FAISS.save_local`` writes index.pkl) persists the
+offset index and stores only the directory, so ``FAISS.load_local`` no longer
+deserializes every chunk.
+"""
+import json
+import mmap
+import os
+import threading
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+INDEX_FILE = "chunks.idx.json"
+# Rewrite the data file when more than this share of it belongs to deleted chunks
+COMPACT_DEAD_RATIO = 0.5
+
+
+class ChunkStore(Docstore, AddableMixin):
+    """Append-only chunk records with an id -> (offset, length) index"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._offsets = {}
+        # Compaction writes the next generation's file; the index names the live one
+        self._generation = 0
+        self._data_size = 0
+        self._live_size = 0
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._writer = None
+        os.makedirs(directory, exist_ok=True)
+        index_path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self._offsets = {doc_id: tuple(entry) for doc_id, entry in state["offsets"].items()}
+            self._generation = state["generation"]
+            self._data_size = state["data_size"]
+            self._live_size = sum(length for _, length in self._offsets.values())
+
+    @classmethod
+    def from_documents(cls, directory, documents):
+        """New store holding ``documents`` ({id: Document}), replacing any previous one"""
+        store = cls(directory)
+        old_path = store.data_path if os.path.exists(store.data_path) else None
+        store._offsets = {}
+        store._generation += 1
+        store._data_size = store._live_size = 0
+        store.add(documents)
+        store.persist()
+        if old_path is not None:
+            os.remove(old_path)
+        return store
+
+    @property
+    def data_path(self):
+        return os.path.join(self.directory, f"chunks.{self._generation}.bin")
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._offsets
+
+    def _view(self, end):
+        """mmap covering at least ``end`` bytes, remapped after appends"""
+        if self._mmap is None or len(self._mmap) < end:
+            if self._writer is not None:
+                self._writer.flush()
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(self.data_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(mmap, "MADV_RANDOM"):
+                # Hits are scattered; readahead would page in most of the file
+                self._mmap.madvise(mmap.MADV_RANDOM)
+        return self._mmap
+
+    def search(self, search):
+        entry = self._offsets.get(search)
+        if entry is None:
+            return f"ID {search} not found."
+        offset, length = entry
+        with self._lock:
+            record = json.loads(self._view(offset + length)[offset:offset + length])
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+    def add(self, texts):
+        overlapping = set(texts) & set(self._offsets)
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        with self._lock:
+            if self._writer is None:
+                self._writer = open(self.data_path, "ab")
+                # Drop bytes appended after the last persisted index (an interrupted run)
+                self._writer.truncate(self._data_size)
+                self._writer.seek(self._data_size)
+            for doc_id, doc in texts.items():
+                record = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata},
+                                    ensure_ascii=False).encode("utf-8")
+                self._writer.write(record)
+                self._offsets[doc_id] = (self._data_size, len(record))
+                self._data_size += len(record)
+                self._live_size += len(record)
+
+    def delete(self, ids):
+        missing = set(ids) - set(self._offsets)
+        if missing:
+            raise ValueError(f"Tried to delete ids that does not exist: {missing}")
+        with self._lock:
+            for doc_id in ids:
+                self._live_size -= self._offsets.pop(doc_id)[1]
+
+    def compact(self):
+        """Copy the live records into the next generation's file and persist.
+
+        The old file is removed only after the index names the new one, so a
+        crash leaves a consistent store; processes that mapped it keep reading it.
+        """
+        with self._lock:
+            view = self._view(self._data_size) if self._data_size else None
+            old_path = self.data_path
+            offsets = {}
+            position = 0
+            with open(os.path.join(self.directory, f"chunks.{self._generation + 1}.bin"),
+                      "wb") as out:
+                for doc_id, (offset, length) in sorted(self._offsets.items(),
+                                                       key=lambda item: item[1][0]):
+                    out.write(view[offset:offset + length])
+                    offsets[doc_id] = (position, length)
+                    position += length
+                out.flush()
+                os.fsync(out.fileno())
+            self._close()
+            self._generation += 1
+            self._offsets = offsets
+            self._data_size = self._live_size = position
+        self._write_index()
+        os.remove(old_path)
+
+    def persist(self):
+        """Flush appended records, then atomically write the offset index"""
+        if self._data_size and self._live_size < self._data_size * (1 - COMPACT_DEAD_RATIO):
+            self.compact()
+            return
+        self._write_index()
+
+    def _write_index(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+            elif not os.path.exists(self.data_path):
+                open(self.data_path, "wb").close()
+            index_path = os.path.join(self.directory, INDEX_FILE)
+            with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({"generation": self._generation, "data_size": self._data_size,
+                           "offsets": self._offsets}, f)
+            os.replace(f"{index_path}.tmp", index_path)
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __getstate__(self):
+        # FAISS.save_local pickles the docstore: persist and keep only the location
+        self.persist()
+        return {"directory": self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"])
+
+
+def use_chunk_store(vectorstore, directory):
+    """Move ``vectorstore``'s in-memory docstore into a ChunkStore at ``directory``"""
+    if not isinstance(vectorstore.docstore, ChunkStore):
+        vectorstore.docstore = ChunkStore.from_documents(directory, vectorstore.docstore._dict)
+    return vectorstore.docstore
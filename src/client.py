@@ -0,0 +1,84 @@
+"""Client for the query service in src/server.py.
+
+``RemoteAgent`` offers the query methods of HybridRAGAgent, so the Streamlit app
+and the batch runner can use a running server instead of loading the indexes
+themselves.
+"""
+import json
+import urllib.request
+from src.metrics import get_metrics
+
+
+class RemoteAgent:
+    """HybridRAGAgent's query API over HTTP"""
+
+    def __init__(self, base_url, timeout=120, metrics=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        # Caches live in the server; these are None so callers can treat both agents alike
+        self.retrieval_cache = None
+        self.response_cache = None
+        # Stage timings reported by the server, recorded on this side too
+        self.metrics = metrics if metrics is not None else get_metrics()
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(self.base_url + path, data=data,
+                                         headers={"Content-Type": "application/json"})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _query_payload(self, query, vector_timeout, graph_timeout, **extra):
+        payload = {"query": query, **extra}
+        if vector_timeout is not None:
+            payload["vector_timeout"] = vector_timeout
+        if graph_timeout is not None:
+            payload["graph_timeout"] = graph_timeout
+        return payload
+
+    def health(self):
+        with self._request("/health") as response:
+            return json.load(response)
+
+    def process_query_with_details(self, query, vector_timeout=None, graph_timeout=None):
+        with self._request("/query", self._query_payload(query, vector_timeout,
+                                                         graph_timeout)) as response:
+            result = json.load(response)
+        self.metrics.record(result["source_details"])
+        return result["answer"], result["source_details"]
+
+    def stream_query_with_details(self, query, vector_timeout=None, graph_timeout=None):
+        """Same events as HybridRAGAgent.stream_query_with_details.
+
+        As with the local agent, the details dict yielded first is completed in
+        place (final timings) before "done".
+        """
+        payload = self._query_payload(query, vector_timeout, graph_timeout, stream=True)
+        source_details = None
+        with self._request("/query", payload) as response:
+            for line in response:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                kind = event["event"]
+                if kind == "details":
+                    source_details = event["source_details"]
+                    yield "details", source_details
+                elif kind == "token":
+                    yield "token", event["token"]
+                elif kind == "done":
+                    source_details.update(event["source_details"])
+                    self.metrics.record(source_details)
+                    yield "done", event["answer"]
+
+    def process_queries(self, queries, max_concurrency=8):
+        """Answer a batch in one request; returns [(answer, source_details), ...] in order.
+
+        ``max_concurrency`` is accepted for compatibility; the server picks its own.
+        """
+        with self._request("/query", {"queries": list(queries)}) as response:
+            results = json.load(response)["results"]
+        for result in results:
+            self.metrics.record(result["source_details"])
+        if results:
+            self.metrics.record_batch(results[0]["source_details"].get("timings", {}))
+        return [(result["answer"], result["source_details"]) for result in results]
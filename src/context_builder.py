@@ -0,0 +1,176 @@
+"""Fuse vector and graph hits and pack them into the prompt under a token budget."""
+
+from src.graph_ranking import format_triple
+
+CONTEXT_TOKEN_BUDGET = 800
+RRF_K = 60
+# Chunks are split with chunk_overlap=200 (src/ingest.py); shorter matches are coincidence
+MIN_OVERLAP_CHARS = 40
+MAX_OVERLAP_CHARS = 250
+# Candidate sources that carry chunk text; the rest are graph relations
+CHUNK_SOURCES = ("vector", "lexical")
+
+
+def estimate_tokens(text):
+    """Approximate Llama 3 token count (about 4 characters per token of English text)"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def reciprocal_rank_fusion(vector_hits, graph_hits, k=RRF_K, weights=None, lexical_hits=()):
+    """Merge ranked hit lists from each source by reciprocal-rank fusion.
+
+    Chunk hits are (text, score); graph hits are ((subject, relation, object),
+    score), rendered for the candidate's ``text`` and kept as its ``triple``.
+    FAISS distances, graph scores and BM25 scores are not comparable, so each
+    hit counts ``weight / (k + rank)`` within its own list; a text found by
+    several sources adds up their terms. Returns candidate dicts, best first.
+    """
+    weights = weights or {}
+    candidates = {}
+    for source, hits in (("vector", vector_hits), ("graph", graph_hits),
+                         ("lexical", lexical_hits)):
+        weight = weights.get(source, 1.0)
+        for rank, (hit, score) in enumerate(hits, 1):
+            text = hit if source in CHUNK_SOURCES else format_triple(hit)
+            candidate = candidates.get(text)
+            if candidate is None:
+                candidates[text] = {"source": source, "text": text, "score": score,
+                                    "rank": rank, "fused": weight / (k + rank)}
+                if source not in CHUNK_SOURCES:
+                    candidates[text]["triple"] = tuple(hit)
+            else:
+                candidate["fused"] += weight / (k + rank)
+    # Ties (same rank in both lists) favour text chunks, which carry more context
+    return sorted(candidates.values(),
+                  key=lambda c: (-c["fused"], c["source"] not in CHUNK_SOURCES, c["rank"]))
+
+
+def strip_overlap(text, packed, min_overlap=MIN_OVERLAP_CHARS, max_overlap=MAX_OVERLAP_CHARS):
+    """Remove the parts of ``text`` already present in ``packed`` chunks.
+
+    Neighbouring chunks share up to ``chunk_overlap`` characters at their
+    boundaries. Returns the remaining text, or "" when ``text`` is fully
+    contained in a packed chunk.
+    """
+    for other in packed:
+        if text in other:
+            return ""
+        limit = min(max_overlap, len(text), len(other))
+        for size in range(limit, min_overlap - 1, -1):
+            if other.endswith(text[:size]):
+                text = text[size:].lstrip()
+                break
+        limit = min(max_overlap, len(text), len(other))
+        for size in range(limit, min_overlap - 1, -1):
+            if other.startswith(text[-size:]):
+                text = text[:-size].rstrip()
+                break
+    return text
+
+
+class RelationGroups:
+    """Triples grouped as ``subject: relation=[objects]; ...``, one line per subject"""
+
+    def __init__(self):
+        self.groups = {}
+        self.lines = []   # relations without a structured triple, kept verbatim
+
+    def cost(self, triple):
+        """Estimated tokens ``add(triple)`` would add"""
+        subject, relation, obj = triple
+        cost = estimate_tokens(obj + ", ")
+        relations = self.groups.get(subject)
+        if relations is None:
+            cost += estimate_tokens(subject + ": \n")
+        if relations is None or relation not in relations:
+            cost += estimate_tokens(relation + "=[]; ")
+        return cost
+
+    def __contains__(self, triple):
+        subject, relation, obj = triple
+        return obj in self.groups.get(subject, {}).get(relation, ())
+
+    def add(self, triple):
+        subject, relation, obj = triple
+        self.groups.setdefault(subject, {}).setdefault(relation, []).append(obj)
+
+    def __len__(self):
+        return sum(len(objs) for relations in self.groups.values()
+                   for objs in relations.values()) + len(self.lines)
+
+    def render(self):
+        lines = [f"{subject}: " + "; ".join(f"{relation}=[{', '.join(objs)}]"
+                                            for relation, objs in relations.items())
+                 for subject, relations in self.groups.items()]
+        return "\n".join(lines + self.lines)
+
+
+def pack_context(candidates, token_budget=CONTEXT_TOKEN_BUDGET):
+    """Take candidates in order while they fit the budget.
+
+    Chunk text already covered by a packed chunk (the splitter's overlap) is
+    removed. Graph candidates carry canonical triples (``b inverse_r a`` is
+    already folded into ``a r b``), which are dropped if already present and
+    rendered grouped by subject. A
+    candidate that does not fit is skipped, so short relations can still fill
+    the space left by a chunk that was too long.
+
+    Returns (context_text, relations_text, stats); ``tokens_saved`` compares
+    against joining every candidate verbatim.
+    """
+    chunks = []
+    relations = RelationGroups()
+    used = 0
+    stats = {"skipped": 0, "overlap_chars_removed": 0, "duplicate_relations": 0}
+    raw_chunks = [c["text"] for c in candidates if c["source"] in CHUNK_SOURCES]
+    raw_relations = [c["text"] for c in candidates if c["source"] not in CHUNK_SOURCES]
+
+    for candidate in candidates:
+        text = candidate["text"]
+        if candidate["source"] in CHUNK_SOURCES:
+            stripped = strip_overlap(text, chunks)
+            stats["overlap_chars_removed"] += len(text) - len(stripped)
+            if not stripped:
+                continue
+            cost = estimate_tokens(stripped) + 2  # plus the separator
+            if used + cost > token_budget:
+                stats["skipped"] += 1
+                continue
+            chunks.append(stripped)
+            used += cost
+            continue
+
+        triple = candidate.get("triple")
+        if triple is None:
+            cost = estimate_tokens(text) + 1
+            if text in relations.lines:
+                stats["duplicate_relations"] += 1
+                continue
+        else:
+            if triple in relations:
+                stats["duplicate_relations"] += 1
+                continue
+            cost = relations.cost(triple)
+        if used + cost > token_budget:
+            stats["skipped"] += 1
+            continue
+        if triple is None:
+            relations.lines.append(text)
+        else:
+            relations.add(triple)
+        used += cost
+
+    context_text = "\n---\n".join(chunks)
+    relations_text = relations.render()
+    raw_tokens = (estimate_tokens("\n---\n".join(raw_chunks)) +
+                  estimate_tokens("\n".join(raw_relations)))
+    tokens = estimate_tokens(context_text) + estimate_tokens(relations_text)
+    stats.update({
+        "token_budget": token_budget,
+        "tokens": tokens,
+        "raw_tokens": raw_tokens,
+        "tokens_saved": raw_tokens - tokens,
+        "chunks": len(chunks),
+        "relations": len(relations),
+    })
+    return context_text, relations_text, stats
@@ -0,0 +1,171 @@
+"""One process-wide sentence encoder shared by the vector store, the agent and the cache.
+
+Concurrent ``embed_query`` calls are collected for up to ``batch_window_ms``
+and encoded as one batch. Backends:
+
+- ``fp32``: the sentence-transformers model as before
+- ``int8``: the same model with torch dynamic int8 quantization of its Linear layers
+- ``onnx``: the model exported to ONNX Runtime (sentence-transformers ``backend="onnx"``)
+
+Vectors from the int8 and onnx backends stay within ``PARITY_MIN_COSINE`` cosine
+similarity of the fp32 ones (checked by benchmarks/embedding_throughput.py),
+so an index built with one backend can be searched with another.
+"""
+import os
+import queue
+import threading
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+BACKENDS = ("fp32", "int8", "onnx")
+PARITY_MIN_COSINE = 0.99
+
+
+def load_encoder(model_name=EMBEDDING_MODEL, backend="fp32"):
+    """Return a SentenceTransformer for ``backend`` on CPU"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        return SentenceTransformer(model_name, device="cpu", backend="onnx")
+    model = SentenceTransformer(model_name, device="cpu")
+    if backend == "int8":
+        import torch
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8,
+                                            inplace=True)
+    return model
+
+
+class _Request:
+    __slots__ = ("texts", "done", "vectors", "error")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.done = threading.Event()
+        self.vectors = None
+        self.error = None
+
+
+class EmbeddingService(Embeddings):
+    """LangChain ``Embeddings`` over a single encoder with query micro-batching"""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, backend="fp32", batch_window_ms=5,
+                 max_batch_size=64, encode_batch_size=32, encoder=None):
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.encode_batch_size = encode_batch_size
+        self.encoder = encoder or load_encoder(model_name, backend)
+        self.batches = 0
+        self.batched_requests = 0
+        self._fork_lock = threading.Lock()
+        self._start_worker()
+
+    def _start_worker(self):
+        # Threads do not survive fork(); a forked child starts its own worker
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def _encode(self, texts):
+        # Same preprocessing as HuggingFaceEmbeddings, so existing indexes stay valid
+        texts = [text.replace("\n", " ") for text in texts]
+        vectors = self.encoder.encode(texts, batch_size=self.encode_batch_size,
+                                      convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _run(self):
+        while True:
+            requests = [self._queue.get()]
+            size = len(requests[0].texts)
+            deadline = time.monotonic() + self.batch_window
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    request = (self._queue.get(timeout=remaining) if remaining > 0
+                               else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                requests.append(request)
+                size += len(request.texts)
+
+            try:
+                vectors = self._encode([text for r in requests for text in r.texts])
+            except Exception as e:
+                for request in requests:
+                    request.error = e
+                    request.done.set()
+                continue
+            self.batches += 1
+            self.batched_requests += len(requests)
+            offset = 0
+            for request in requests:
+                request.vectors = vectors[offset:offset + len(request.texts)]
+                offset += len(request.texts)
+                request.done.set()
+
+    def _submit(self, texts):
+        if os.getpid() != self._pid:
+            with self._fork_lock:
+                if os.getpid() != self._pid:
+                    if self.backend == "onnx":
+                        # Nor does ONNX Runtime's session thread pool: reload the session
+                        self.encoder = load_encoder(self.model_name, self.backend)
+                    self._start_worker()
+        request = _Request(texts)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.vectors
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        # Large batches (ingest, batch evaluation) gain nothing from waiting
+        if len(texts) >= self.max_batch_size:
+            return self._encode(texts).tolist()
+        return self._submit(texts).tolist()
+
+    def embed_query(self, text):
+        return self._submit([text])[0].tolist()
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "batches": self.batches,
+            "requests": self.batched_requests,
+            "mean_batch_requests": self.batched_requests / self.batches if self.batches else 0.0,
+        }
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_embeddings(model_name=EMBEDDING_MODEL, backend=None):
+    """Process-wide embedding service, loaded on first use and shared by every consumer.
+
+    ``backend`` defaults to the EMBEDDING_BACKEND environment variable, then fp32.
+    """
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "fp32")
+    with _services_lock:
+        key = (model_name, backend)
+        if key not in _services:
+            _services[key] = EmbeddingService(model_name, backend)
+        return _services[key]
+
+
+def cosine_parity(reference, candidate):
+    """Per-row cosine similarity between two embedding matrices"""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    dots = np.sum(reference * candidate, axis=1)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    return dots / np.maximum(norms, 1e-12)
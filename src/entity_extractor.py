@@ -0,0 +1,154 @@
+import os
+import re
+from collections import deque
+from src.biored_converter import iter_relations
+
+ENTITY_TYPES = ("diseases", "symptoms", "treatments", "anatomy")
+
+# Literal vocabularies of the original per-pattern regexes
+BASE_VOCABULARY = {
+    "diseases": [
+        "diabetes", "cancer", "hypertension", "asthma", "arthritis", "pneumonia", "fever",
+        "malaria", "tuberculosis", "covid", "corona", "influenza", "hepatitis", "bronchitis",
+        "gastritis", "dermatitis",
+    ],
+    "treatments": [
+        "insulin", "aspirin", "antibiotics", "chemotherapy", "surgery", "ibuprofen",
+        "acetaminophen", "paracetamol", "treatment", "therapy", "medicine", "medication",
+        "drug", "remedy",
+    ],
+    "symptoms": [
+        "pain", "fever", "nausea", "fatigue", "headache", "cough", "chills", "sweating",
+        "vomiting", "dizziness", "high blood pressure", "chest pain", "shortness of breath",
+        "stomach pain", "back pain",
+    ],
+}
+
+# Word-suffix rules, checked together on every word (\w+itis, \w+mycin, ...)
+SUFFIX_RULES = {
+    "itis": "diseases", "osis": "diseases", "emia": "diseases", "pathy": "diseases",
+    "mycin": "treatments", "cillin": "treatments", "azole": "treatments",
+}
+_SUFFIXES = tuple(SUFFIX_RULES)
+
+# Maximal runs of word / non-word characters, the same units regex \b separates
+_TOKEN_PATTERN = re.compile(r"\w+|\W+")
+_WORD_PATTERN = re.compile(r"\w")
+
+
+def _tokenize(text):
+    return _TOKEN_PATTERN.findall(text)
+
+
+class TokenAutomaton:
+    """Aho-Corasick automaton whose alphabet is word / separator tokens.
+
+    A term matches only where its tokens line up with whole tokens of the
+    text, which is exactly ``\\b(term)\\b`` for terms that start and end with a
+    word character.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+    def add(self, term, payload):
+        state = 0
+        for token in _tokenize(term):
+            next_state = self.goto[state].get(token)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][token] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(payload)
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(token, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+        return self
+
+    def search(self, tokens):
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for token in tokens:
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if output[state]:
+                yield from output[state]
+
+
+class MedicalEntityExtractor:
+    """Single-pass dictionary + suffix entity extractor.
+
+    With the default vocabulary it returns the same entity sets as the original
+    eight-regex ``extract_medical_entities``; ``extra_terms`` ({type: terms})
+    adds e.g. graph and BioRED entity names to the same automaton.
+    """
+
+    def __init__(self, extra_terms=None):
+        vocabulary = {entity_type: set(terms) for entity_type, terms in BASE_VOCABULARY.items()}
+        for entity_type, terms in (extra_terms or {}).items():
+            vocabulary.setdefault(entity_type, set()).update(terms)
+
+        categories = {}
+        for entity_type, terms in vocabulary.items():
+            for term in terms:
+                term = term.lower().strip()
+                # Word-boundary semantics need a word character at both ends
+                if len(term) > 2 and _WORD_PATTERN.match(term) and _WORD_PATTERN.match(term[-1]):
+                    categories.setdefault(term, set()).add(entity_type)
+
+        self.automaton = TokenAutomaton()
+        for term, types in categories.items():
+            self.automaton.add(term, (term, tuple(sorted(types))))
+        self.automaton.build()
+        self.vocabulary_size = len(categories)
+
+    def extract(self, text):
+        entities = {entity_type: set() for entity_type in ENTITY_TYPES}
+        tokens = _tokenize(text.lower())
+
+        for term, types in self.automaton.search(tokens):
+            for entity_type in types:
+                entities[entity_type].add(term)
+
+        for token in tokens:
+            if token.endswith(_SUFFIXES):
+                for suffix, entity_type in SUFFIX_RULES.items():
+                    if token.endswith(suffix) and len(token) > len(suffix):
+                        entities[entity_type].add(token)
+
+        return {entity_type: list(terms) for entity_type, terms in entities.items()}
+
+
+def vocabulary_from_sources(graph=None, relations_files=()):
+    """Collect typed entity names from graph nodes and relation files"""
+    extra_terms = {"diseases": set(), "symptoms": set(), "treatments": set()}
+    if graph is not None:
+        for node, data in graph.nodes(data=True):
+            if data.get("type") in extra_terms:
+                extra_terms[data["type"]].add(str(node))
+            elif data.get("type") == "medical_entity":
+                extra_terms["diseases"].add(str(node))
+
+    for relations_file in relations_files:
+        if not os.path.exists(relations_file):
+            continue
+        for entity, rel_type, target in iter_relations(relations_file):
+            extra_terms["diseases"].add(entity)
+            if rel_type in ("symptoms", "treatments") and isinstance(target, str):
+                extra_terms[rel_type].add(target)
+    return extra_terms
@@ -0,0 +1,205 @@
+"""Full-corpus entity extraction for the knowledge graph.
+
+Worker processes each parse a page range, run the Medical-NER pipeline over
+the chunks in batches and merge in the dictionary extractor. The parent
+deduplicates entities across workers and counts entity pairs that appear in
+the same chunk, pruning rare pairs whenever the counter outgrows ``max_pairs``.
+
+    python -m src.graph_builder data/The_GALE_ENCYCLOPEDIA_of_MEDICINE_SECOND.pdf --workers 4
+"""
+import argparse
+import os
+import time
+from collections import Counter, defaultdict
+from src.entity_extractor import ENTITY_TYPES, MedicalEntityExtractor
+from src.ingest import count_pages, iter_pdf_pages, parse_page_range
+
+NER_MODEL = "blaze999/Medical-NER"
+CO_OCCURRENCE_RELATION = "co_occurs_with"
+
+# Medical-NER entity groups kept in the graph, mapped to extractor types
+NER_LABELS = {
+    "DISEASE_DISORDER": "diseases",
+    "SIGN_SYMPTOM": "symptoms",
+    "MEDICATION": "treatments",
+    "THERAPEUTIC_PROCEDURE": "treatments",
+    "BIOLOGICAL_STRUCTURE": "anatomy",
+}
+
+# Per-process state, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(extra_terms, use_ner, batch_size, min_score, threads):
+    _worker["extractor"] = MedicalEntityExtractor(extra_terms)
+    _worker["batch_size"] = batch_size
+    _worker["min_score"] = min_score
+    _worker["ner"] = None
+    if not use_ner:
+        return
+    try:
+        import torch
+        from transformers import pipeline
+        # Workers share the CPU; one BLAS pool per core avoids oversubscription
+        torch.set_num_threads(threads)
+        _worker["ner"] = pipeline(
+            "token-classification",
+            NER_MODEL,
+            aggregation_strategy="simple",
+            device=-1
+        )
+    except Exception as e:
+        print(f"⚠️ NER model unavailable in worker {os.getpid()}, using dictionary only: {e}")
+
+
+def clean_entity(text):
+    return " ".join(text.lower().split()).strip(" .,;:()[]'\"-")
+
+
+def extract_chunk_batch(texts):
+    """Entities for each text as {type: [names]}, NER results merged with the dictionary"""
+    extractor = _worker["extractor"]
+    results = [extractor.extract(text) for text in texts]
+    ner = _worker["ner"]
+    if ner is None or not texts:
+        return results
+
+    for entities, spans in zip(results, ner(texts, batch_size=_worker["batch_size"])):
+        for span in spans:
+            entity_type = NER_LABELS.get(span["entity_group"])
+            name = clean_entity(span["word"])
+            if entity_type and span["score"] >= _worker["min_score"] and len(name) > 2:
+                if name not in entities[entity_type]:
+                    entities[entity_type].append(name)
+    return results
+
+
+def rank_mentions(text, entities):
+    """The chunk's distinct entity names, most mentioned first, then by first position"""
+    text = " ".join(text.lower().split())
+    names = {name for names in entities.values() for name in names}
+
+    def salience(name):
+        first = text.find(name)
+        return -text.count(name), first if first >= 0 else len(text), name
+
+    return sorted(names, key=salience)
+
+
+def extract_page_range(pdf_path, start, end):
+    """Worker task: [(page, [(entities, ranked names) per chunk])] for pages [start, end)"""
+    pages = parse_page_range(pdf_path, start, end)
+    texts = [text for _, _, chunks in pages for text, _ in chunks]
+    results = iter(zip(extract_chunk_batch(texts), texts))
+    return [(page_num, [(entities, rank_mentions(text, entities))
+                        for entities, text in (next(results) for _ in chunks)])
+            for page_num, _, chunks in pages]
+
+
+def _prune_pairs(pair_counts, floor, max_pairs):
+    """Drop pairs counted fewer than ``floor`` times, raising it until half of ``max_pairs``
+    is free; returns the number dropped"""
+    before = len(pair_counts)
+    while len(pair_counts) > max_pairs // 2:
+        for key in [key for key, count in pair_counts.items() if count < floor]:
+            del pair_counts[key]
+        floor += 1
+    return before - len(pair_counts)
+
+
+def extract_corpus(pdf_path, extra_terms=None, workers=None, batch_size=32, pages_per_task=8,
+                   use_ner=True, min_score=0.5, min_cooccurrence=2, max_entities_per_chunk=40,
+                   max_pairs=2_000_000, log_every=200):
+    """Extract entities from every chunk of a PDF.
+
+    Returns (entity_types, pairs, stats): the type of each distinct entity
+    (its most frequent one), and for each entity pair seen together in at
+    least ``min_cooccurrence`` chunks, the number of such chunks.
+
+    Only the ``max_entities_per_chunk`` most mentioned entities of a chunk are
+    paired. When more than ``max_pairs`` pairs are being counted, pairs still
+    below ``min_cooccurrence`` are dropped, so a pair whose chunks are far
+    apart in the corpus can be undercounted; ``stats["pruned_pairs"]`` says
+    how many were dropped.
+    """
+    workers = workers or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    total_pages = count_pages(pdf_path)
+
+    type_votes = defaultdict(Counter)
+    entity_ids = {}
+    names = []
+    pair_counts = Counter()
+    stats = {"pages": 0, "chunks": 0, "pruned_pairs": 0}
+    started = time.time()
+
+    records = iter_pdf_pages(
+        pdf_path, total_pages, workers, pages_per_task,
+        task=extract_page_range, initializer=_init_worker,
+        initargs=(extra_terms or {}, use_ner, batch_size, min_score, threads)
+    )
+    for page_num, chunk_entities in records:
+        for entities, ranked in chunk_entities:
+            for entity_type in ENTITY_TYPES:
+                for name in entities.get(entity_type, ()):
+                    type_votes[name][entity_type] += 1
+                    if name not in entity_ids:
+                        entity_ids[name] = len(names)
+                        names.append(name)
+            # Pair counting is quadratic; entity-dense chunks such as indexes keep
+            # only their most mentioned entities
+            found = sorted(entity_ids[name] for name in ranked[:max_entities_per_chunk])
+            for i, a in enumerate(found):
+                for b in found[i + 1:]:
+                    # Pack the id pair into one int to keep the counter small
+                    pair_counts[(a << 32) | b] += 1
+            if len(pair_counts) > max_pairs:
+                stats["pruned_pairs"] += _prune_pairs(pair_counts, min_cooccurrence, max_pairs)
+            stats["chunks"] += 1
+        stats["pages"] += 1
+        if stats["pages"] % log_every == 0:
+            elapsed = time.time() - started
+            print(f"  🧠 {stats['pages']}/{total_pages} pages, {stats['chunks']} chunks "
+                  f"({stats['chunks'] / elapsed:.1f} chunks/sec)")
+
+    entity_types = {}
+    order = {entity_type: i for i, entity_type in enumerate(ENTITY_TYPES)}
+    for name, votes in type_votes.items():
+        entity_types[name] = min(votes, key=lambda t: (-votes[t], order[t]))
+    pairs = {(names[key >> 32], names[key & 0xFFFFFFFF]): count
+             for key, count in pair_counts.items() if count >= min_cooccurrence}
+
+    elapsed = time.time() - started
+    stats.update(entities=len(entity_types), pairs=len(pairs), seconds=round(elapsed, 1),
+                 chunks_per_sec=round(stats["chunks"] / elapsed, 1) if elapsed else 0.0)
+    print(f"📋 Extracted {stats['entities']} entities and {stats['pairs']} co-occurring pairs "
+          f"from {stats['chunks']} chunks ({stats['chunks_per_sec']} chunks/sec)")
+    return entity_types, pairs, stats
+
+
+def main():
+    from src.knowledge_graph import KnowledgeGraph
+
+    parser = argparse.ArgumentParser(description="Build the knowledge graph from the whole PDF")
+    parser.add_argument("pdf_path")
+    parser.add_argument("--out", default="knowledge_graph.kgb")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=32, help="NER batch size per worker")
+    parser.add_argument("--min-cooccurrence", type=int, default=2,
+                        help="minimum number of shared chunks for a co_occurs_with edge")
+    parser.add_argument("--no-ner", action="store_true", help="dictionary extractor only")
+    args = parser.parse_args()
+
+    for path in (args.out, "knowledge_graph.pkl"):
+        if os.path.exists(path):
+            parser.error(f"{path} already exists; remove it to rebuild the graph")
+
+    kg = KnowledgeGraph()
+    kg.build_graph_from_pdf(args.pdf_path, persist_file=args.out, full_corpus=True,
+                            ner_workers=args.workers, ner_batch_size=args.batch_size,
+                            use_ner=not args.no_ner, min_cooccurrence=args.min_cooccurrence)
+    print(f"✅ Saved {args.out}: {kg.get_graph_stats()}")
+
+
+if __name__ == "__main__":
+    main()
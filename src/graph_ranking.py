@@ -0,0 +1,170 @@
+import heapq
+import math
+
+# How useful a relation is as answer context; unknown relations get DEFAULT_RELATION_WEIGHT
+RELATION_WEIGHTS = {
+    "treatments": 1.0,
+    "symptoms": 1.0,
+    "causes": 0.9,
+    "complications": 0.8,
+    "risk_factors": 0.8,
+    "diagnosis": 0.7,
+    "co_occurs_with": 0.45,
+    "related_to": 0.4,
+}
+DEFAULT_RELATION_WEIGHT = 0.5
+SYMMETRIC_RELATIONS = {"co_occurs_with"}
+# Question words that ask for a specific relation; other relations are then down-weighted
+RELATION_CUES = {
+    "symptoms": ("symptom", "sign", "feel"),
+    "treatments": ("treat", "therap", "cure", "medication", "medicine", "drug", "manage"),
+    "causes": ("cause", "why", "risk", "trigger"),
+}
+OFF_FOCUS_WEIGHT = 0.5
+INVERSE_PREFIX = "inverse_"
+HOP_DECAY = 0.6
+
+
+def canonical_triple(u, v, relation):
+    """Fold ``b inverse_r a`` into ``a r b`` and order symmetric relations by name"""
+    if relation.startswith(INVERSE_PREFIX):
+        return v, relation[len(INVERSE_PREFIX):], u
+    if relation in SYMMETRIC_RELATIONS and str(v) < str(u):
+        return v, relation, u
+    return u, relation, v
+
+
+def format_triple(triple):
+    u, relation, v = triple
+    return f"{u} {relation} {v}"
+
+
+def degree_penalty(degree):
+    # 1.0 for a leaf, ~0.25 for a hub with a few hundred edges
+    return 1.0 / math.log2(2 + degree / 8)
+
+
+def _incident_edges(graph, node):
+    """(u, v, data, neighbor degree) for the out- then in-edges of ``node``"""
+    if getattr(graph, "is_compact", False):
+        # Neighbour degrees come straight from the CSR offsets, no name lookups
+        return graph.incident_edges(node)
+    edges = [(node, v, data) for _, v, data in graph.out_edges(node, data=True)]
+    edges += [(u, node, data) for u, _, data in graph.in_edges(node, data=True)]
+    degrees = {}
+    incident = []
+    for u, v, data in edges:
+        neighbor = v if u == node else u
+        if neighbor not in degrees:
+            degrees[neighbor] = graph.degree(neighbor)
+        incident.append((u, v, data, degrees[neighbor]))
+    return incident
+
+
+def ranked_edges(graph, node):
+    """Distinct canonical triples touching ``node``, best first, as
+    (factor, triple, neighbor, text) where factor is relation weight x neighbor
+    degree penalty and text is the rendered triple"""
+    triples = {}
+    for u, v, data, degree in _incident_edges(graph, node):
+        if not data:
+            continue
+        triple = canonical_triple(u, v, data.get("relation", "related_to"))
+        neighbor = v if u == node else u
+        factor = RELATION_WEIGHTS.get(triple[1], DEFAULT_RELATION_WEIGHT)
+        weight = data.get("weight")
+        if weight is not None:
+            # Co-occurrence counts: saturating boost, 1 shared chunk ~0.5, 10 ~0.9
+            factor *= weight / (weight + 1)
+        factor *= degree_penalty(degree)
+        if factor > triples.get(triple, (0.0,))[0]:
+            triples[triple] = (factor, neighbor)
+    ranked = [(factor, triple, neighbor, format_triple(triple))
+              for triple, (factor, neighbor) in triples.items()]
+    ranked.sort(key=lambda item: (-item[0], item[3]))
+    return ranked
+
+
+def query_relations(query_lower):
+    """Relations the question explicitly asks about"""
+    return {relation for relation, cues in RELATION_CUES.items()
+            if any(cue in query_lower for cue in cues)}
+
+
+def match_score(node, query_lower, keywords):
+    """How well a matched node name fits the query, in (0, 1]"""
+    name = str(node).lower()
+    if name == query_lower or name in keywords:
+        return 1.0
+    if name in query_lower:
+        # Multi-word names found verbatim in the question are strong matches
+        return 0.6 + 0.4 * len(name) / max(len(query_lower), 1)
+    covered = max((len(k) for k in keywords if k in name), default=0)
+    return 0.2 + 0.4 * covered / len(name)
+
+
+def _offer(top, top_texts, entry, size):
+    """Keep ``top`` a min-heap of the ``size`` best distinct triples"""
+    text = entry[1]
+    if text in top_texts:
+        # A better path to a triple already in the top-k: update it in place
+        top[:] = [entry if item[1] == text else item for item in top]
+        heapq.heapify(top)
+    elif len(top) < size:
+        heapq.heappush(top, entry)
+        top_texts.add(text)
+    elif entry > top[0]:
+        top_texts.discard(heapq.heapreplace(top, entry)[1])
+        top_texts.add(text)
+
+
+def best_first_triples(seeds, edges_of, max_results=5, max_hops=2, focus=(), max_frontier=64,
+                       max_edges_per_node=32, max_expansions=256):
+    """Rank triples reachable from scored seeds.
+
+    ``seeds`` is [(score, node)], ``edges_of(node)`` returns ``ranked_edges``.
+    A triple scores its source path score x the edge factor, times
+    OFF_FOCUS_WEIGHT if ``focus`` names other relations; each further hop is
+    discounted by HOP_DECAY. Nodes are expanded best first from a
+    frontier capped at ``max_frontier``. Scores never grow along a path, so
+    the search stops as soon as the best unexpanded node cannot beat the
+    current k-th result. Returns [(score, triple)] sorted best first, where
+    triple is the canonical (subject, relation, object).
+    """
+    frontier = [(-score, str(node), node, 0) for score, node in seeds]
+    heapq.heapify(frontier)
+    best = {}        # triple -> (score, text)
+    top = []         # min-heap of the best max_results (score, text)
+    top_texts = set()
+    expanded = set()
+    expansions = 0
+
+    while frontier and expansions < max_expansions:
+        neg_score, _, node, depth = heapq.heappop(frontier)
+        score = -neg_score
+        if len(top) >= max_results and score <= top[0][0]:
+            break
+        if node in expanded:
+            continue
+        expanded.add(node)
+        expansions += 1
+
+        for factor, triple, neighbor, text in edges_of(node)[:max_edges_per_node]:
+            if len(top) >= max_results and score * factor <= top[0][0]:
+                # Edges are sorted, so the rest of this node's edges score lower
+                break
+            triple_score = score * factor
+            if focus and triple[1] not in focus:
+                triple_score *= OFF_FOCUS_WEIGHT
+            if triple_score > best.get(triple, (0.0,))[0]:
+                best[triple] = (triple_score, text)
+                _offer(top, top_texts, (triple_score, text), max_results)
+            if depth + 1 < max_hops and neighbor not in expanded:
+                heapq.heappush(frontier, (-triple_score * HOP_DECAY, str(neighbor), neighbor,
+                                          depth + 1))
+        if len(frontier) > max_frontier:
+            frontier = heapq.nsmallest(max_frontier, frontier)
+            heapq.heapify(frontier)
+
+    ranked = sorted(best.items(), key=lambda item: (-item[1][0], item[1][1]))[:max_results]
+    return [(score, triple) for triple, (score, _) in ranked]
@@ -0,0 +1,392 @@
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import pickle
+from functools import cached_property
+import numpy as np
+import networkx as nx
+from src.binary_file import StringTable, encode_strings, map_array, read_header, write_arrays
+
+MAGIC = b"KGBIN\x00\x00\x00"
+FORMAT_VERSION = 2
+
+# Framing as in src/binary_file.py. Nodes are stored sorted by their UTF-8 name
+# so lookups can binary-search the string table without building a name -> id dict.
+ARRAYS = [
+    ("name_offsets", "<i8"),
+    ("name_bytes", "u1"),
+    ("node_type", "<i2"),
+    ("node_source", "<i2"),
+    ("out_indptr", "<i8"),
+    ("out_indices", "<i4"),
+    ("out_relation", "<i2"),
+    ("in_indptr", "<i8"),
+    ("in_indices", "<i4"),
+    ("in_relation", "<i2"),
+    # Added in version 2; NaN marks an edge without a weight
+    ("out_weight", "<f4"),
+    ("in_weight", "<f4"),
+]
+
+
+def _code_table(values):
+    table = sorted({v for v in values if v is not None})
+    codes = {v: i for i, v in enumerate(table)}
+    return table, np.array([codes.get(v, -1) for v in values], dtype=np.int16)
+
+
+def _csr(num_nodes, rows, cols, rels, weights):
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+    return (indptr, cols[order].astype(np.int32), rels[order].astype(np.int16),
+            weights[order].astype(np.float32))
+
+
+def save_graph(graph, path):
+    """Write a networkx (or compact) graph to the binary format"""
+    names = sorted(graph.nodes(), key=lambda n: str(n).encode("utf-8"))
+    node_ids = {node: i for i, node in enumerate(names)}
+    name_offsets, name_bytes = encode_strings(str(n) for n in names)
+
+    node_data = dict(graph.nodes(data=True))
+    types, node_type = _code_table([node_data[n].get("type") for n in names])
+    sources, node_source = _code_table([node_data[n].get("source") for n in names])
+
+    edges = [(node_ids[u], node_ids[v], data.get("relation"), data.get("weight"))
+             for u, v, data in graph.edges(data=True)]
+    relations, rel_codes = _code_table([rel for _, _, rel, _ in edges])
+    src = np.array([u for u, _, _, _ in edges], dtype=np.int64)
+    dst = np.array([v for _, v, _, _ in edges], dtype=np.int64)
+    weights = np.array([np.nan if w is None else w for _, _, _, w in edges], dtype=np.float32)
+
+    out_indptr, out_indices, out_relation, out_weight = _csr(len(names), src, dst, rel_codes, weights)
+    in_indptr, in_indices, in_relation, in_weight = _csr(len(names), dst, src, rel_codes, weights)
+
+    arrays = {
+        "name_offsets": name_offsets, "name_bytes": name_bytes,
+        "node_type": node_type, "node_source": node_source,
+        "out_indptr": out_indptr, "out_indices": out_indices, "out_relation": out_relation,
+        "in_indptr": in_indptr, "in_indices": in_indices, "in_relation": in_relation,
+        "out_weight": out_weight, "in_weight": in_weight,
+    }
+    header = {
+        "num_nodes": len(names),
+        "num_edges": len(edges),
+        "relations": relations,
+        "node_types": types,
+        "node_sources": sources,
+    }
+    write_arrays(path, MAGIC, FORMAT_VERSION, header,
+                 [(name, arrays[name].astype(dtype, copy=False)) for name, dtype in ARRAYS])
+
+
+def load_graph(path):
+    """Memory-map a binary graph file as a read-only CompactGraph"""
+    _, header = read_header(path, MAGIC, FORMAT_VERSION, "knowledge graph binary")
+    arrays = {}
+    for name, dtype in ARRAYS:
+        spec = header["arrays"].get(name)
+        if spec is None:
+            # Version 1 files have no edge weights
+            arrays[name] = np.full(header["num_edges"], np.nan, dtype=dtype)
+        else:
+            arrays[name] = map_array(path, spec, dtype)
+    return CompactGraph(header, arrays)
+
+
+class CompactGraph:
+    """Read-only view over the binary CSR graph with a networkx-like API"""
+
+    is_compact = True
+
+    def __init__(self, header, arrays):
+        self.header = header
+        self.relations = header["relations"]
+        self.node_types = header["node_types"]
+        self.node_sources = header["node_sources"]
+        self._num_nodes = header["num_nodes"]
+        self._num_edges = header["num_edges"]
+        for name, data in arrays.items():
+            setattr(self, name, data)
+        self._names = StringTable(self.name_offsets, self.name_bytes)
+
+    def number_of_nodes(self):
+        return self._num_nodes
+
+    def number_of_edges(self):
+        return self._num_edges
+
+    def __len__(self):
+        return self._num_nodes
+
+    def __contains__(self, node):
+        return self._node_id(node) is not None
+
+    def has_node(self, node):
+        return node in self
+
+    def __iter__(self):
+        return self.nodes()
+
+    def _node_id(self, node):
+        key = str(node).encode("utf-8")
+        i = bisect.bisect_left(self._names, key)
+        if i < self._num_nodes and self._names[i] == key:
+            return i
+        return None
+
+    def _name(self, i):
+        return self._names.text(i)
+
+    def _node_attrs(self, i):
+        attrs = {}
+        if self.node_type[i] >= 0:
+            attrs["type"] = self.node_types[self.node_type[i]]
+        if self.node_source[i] >= 0:
+            attrs["source"] = self.node_sources[self.node_source[i]]
+        return attrs
+
+    def nodes(self, data=False):
+        for i in range(self._num_nodes):
+            if data:
+                yield self._name(i), self._node_attrs(i)
+            else:
+                yield self._name(i)
+
+    def _slice(self, node, direction):
+        i = self._node_id(node)
+        if i is None:
+            raise nx.NetworkXError(f"The node {node} is not in the graph.")
+        indptr = getattr(self, f"{direction}_indptr")
+        start, end = int(indptr[i]), int(indptr[i + 1])
+        return (getattr(self, f"{direction}_indices")[start:end],
+                getattr(self, f"{direction}_relation")[start:end],
+                getattr(self, f"{direction}_weight")[start:end])
+
+    def _relation_attrs(self, code, weight):
+        attrs = {"relation": self.relations[code]} if code >= 0 else {}
+        if weight == weight:  # not NaN
+            attrs["weight"] = weight
+        return attrs
+
+    def neighbors(self, node):
+        indices, _, _ = self._slice(node, "out")
+        return (self._name(j) for j in dict.fromkeys(indices.tolist()))
+
+    successors = neighbors
+
+    def predecessors(self, node):
+        indices, _, _ = self._slice(node, "in")
+        return (self._name(j) for j in dict.fromkeys(indices.tolist()))
+
+    def out_edges(self, node, data=False):
+        indices, rels, weights = self._slice(node, "out")
+        for j, code, weight in zip(indices.tolist(), rels.tolist(), weights.tolist()):
+            yield self._edge(node, self._name(j), code, weight, data)
+
+    def in_edges(self, node, data=False):
+        indices, rels, weights = self._slice(node, "in")
+        for j, code, weight in zip(indices.tolist(), rels.tolist(), weights.tolist()):
+            yield self._edge(self._name(j), node, code, weight, data)
+
+    def _edge(self, u, v, code, weight, data):
+        if data is True:
+            return u, v, self._relation_attrs(code, weight)
+        if data == "relation":
+            return u, v, self.relations[code] if code >= 0 else None
+        return u, v
+
+    def edges(self, data=False):
+        for i in range(self._num_nodes):
+            yield from self.out_edges(self._name(i), data=data)
+
+    def get_edge_data(self, u, v):
+        i, j = self._node_id(u), self._node_id(v)
+        if i is None or j is None:
+            return None
+        start, end = int(self.out_indptr[i]), int(self.out_indptr[i + 1])
+        indices = self.out_indices[start:end]
+        # Each row is sorted by target id
+        lo = int(np.searchsorted(indices, j, side="left"))
+        hi = int(np.searchsorted(indices, j, side="right"))
+        if lo == hi:
+            return None
+        rels = self.out_relation[start + lo:start + hi].tolist()
+        weights = self.out_weight[start + lo:start + hi].tolist()
+        return {key: self._relation_attrs(code, weight)
+                for key, (code, weight) in enumerate(zip(rels, weights))}
+
+    def has_edge(self, u, v):
+        return self.get_edge_data(u, v) is not None
+
+    def out_degree(self, node):
+        i = self._node_id(node)
+        return int(self.out_indptr[i + 1] - self.out_indptr[i])
+
+    def in_degree(self, node):
+        i = self._node_id(node)
+        return int(self.in_indptr[i + 1] - self.in_indptr[i])
+
+    @cached_property
+    def degrees(self):
+        """Total degree of every node id, computed once from the CSR offsets"""
+        return np.diff(self.out_indptr) + np.diff(self.in_indptr)
+
+    def degree(self, node=None):
+        if node is None:
+            # Like networkx's DegreeView: (node, degree) for every node
+            return ((self._name(i), d) for i, d in enumerate(self.degrees.tolist()))
+        i = self._node_id(node)
+        if i is None:
+            raise nx.NetworkXError(f"The node {node} is not in the graph.")
+        return int(self.degrees[i])
+
+    def highest_degree(self, k):
+        """The ``k`` nodes with the most edges as [(node, degree)], without decoding the rest"""
+        k = min(k, self._num_nodes)
+        if k <= 0:
+            return []
+        degrees = self.degrees
+        top = np.argpartition(-degrees, k - 1)[:k]
+        top = top[np.lexsort((top, -degrees[top]))]
+        return [(self._name(i), int(degrees[i])) for i in top.tolist()]
+
+    def incident_edges(self, node):
+        """(u, v, attrs, neighbor degree) for the out- then in-edges of ``node``.
+
+        One name lookup for ``node``; neighbour degrees are read by id.
+        """
+        degrees = self.degrees
+        for direction in ("out", "in"):
+            indices, rels, weights = self._slice(node, direction)
+            for j, code, weight in zip(indices.tolist(), rels.tolist(), weights.tolist()):
+                name = self._name(j)
+                u, v = (node, name) if direction == "out" else (name, node)
+                yield u, v, self._relation_attrs(code, weight), int(degrees[j])
+
+    def to_networkx(self):
+        """Materialize a mutable MultiDiGraph copy"""
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from(self.nodes(data=True))
+        graph.add_edges_from(self.edges(data=True))
+        return graph
+
+
+def manifest_path(graph_path):
+    return f"{os.path.splitext(graph_path)[0]}.manifest.json"
+
+
+def load_manifest(graph_path):
+    """Load the record (hash, size, mtime) of relation sources merged into a persisted graph"""
+    path = manifest_path(graph_path)
+    if not os.path.exists(path):
+        return {"sources": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(graph_path, manifest):
+    path = manifest_path(graph_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def source_edges_path(graph_path):
+    return f"{os.path.splitext(graph_path)[0]}.edges.json"
+
+
+def load_source_edges(graph_path):
+    """{source: [[entity, relation, target], ...]}, read only when a source changed"""
+    path = source_edges_path(graph_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_source_edges(graph_path, source_edges):
+    path = source_edges_path(graph_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(source_edges, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compact_graph(graph):
+    """Collapse parallel edges that carry the same relation into one edge"""
+    compacted = nx.MultiDiGraph()
+    compacted.add_nodes_from(graph.nodes(data=True))
+    seen = set()
+    for u, v, data in graph.edges(data=True):
+        key = (u, v, data.get("relation"))
+        if key not in seen:
+            seen.add(key)
+            compacted.add_edge(u, v, **data)
+    return compacted
+
+
+def compact_file(path, out_path=None):
+    """Rewrite a .pkl or binary graph file without duplicate parallel edges"""
+    out_path = out_path or path
+    if path.endswith(".pkl"):
+        with open(path, "rb") as f:
+            graph = pickle.load(f)
+    else:
+        graph = load_graph(path)
+    before = graph.number_of_edges()
+    graph = compact_graph(graph)
+
+    if out_path.endswith(".pkl"):
+        with open(out_path, "wb") as f:
+            pickle.dump(graph, f)
+    else:
+        save_graph(graph, out_path)
+    print(f"✅ Compacted {path} -> {out_path}: {before} -> {graph.number_of_edges()} edges")
+    return out_path
+
+
+def convert_pickle(pkl_path, out_path):
+    """Convert a pickled networkx graph to the binary format"""
+    with open(pkl_path, "rb") as f:
+        graph = pickle.load(f)
+    graph = compact_graph(graph)
+    save_graph(graph, out_path)
+    print(f"✅ Converted {pkl_path} -> {out_path} "
+          f"({graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges)")
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Knowledge graph storage tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="convert a .pkl graph to the binary format")
+    convert.add_argument("pkl_path")
+    convert.add_argument("out_path", nargs="?", default="knowledge_graph.kgb")
+
+    compact = subparsers.add_parser("compact", help="collapse duplicate parallel edges")
+    compact.add_argument("path")
+    compact.add_argument("out_path", nargs="?")
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        convert_pickle(args.pkl_path, args.out_path)
+    elif args.command == "compact":
+        compact_file(args.path, args.out_path)
+
+
+if __name__ == "__main__":
+    main()
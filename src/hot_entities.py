@@ -0,0 +1,93 @@
+"""Which knowledge graph entities keep their ranked edges pinned in memory.
+
+Hub entities such as "fever" or "diabetes" have hundreds of edges, and
+``ranked_edges`` walks every successor and predecessor to rank them. The
+ranked edges of the highest-degree entities, and of entities that queries
+keep matching, are pinned in KnowledgeGraph's edge cache so a burst of
+rarely queried entities cannot evict them. This module only decides
+membership; the edges themselves are ranked on first use.
+"""
+import heapq
+import threading
+from collections import Counter
+
+HOT_ENTITIES = 256
+# A non-hub entity becomes hot once queries have matched it this many times
+PROMOTE_AFTER = 3
+# Seeds below this match_score only share a substring with the query and are not counted
+PROMOTE_MIN_MATCH = 0.6
+# Query counts are halved every DECAY_EVERY recorded matches, so the counter stays bounded
+DECAY_EVERY = 10000
+
+
+class HotEntities:
+    """At most ``max_entities`` hot nodes plus a decaying count of query matches"""
+
+    def __init__(self, max_entities=HOT_ENTITIES, promote_after=PROMOTE_AFTER,
+                 decay_every=DECAY_EVERY):
+        self.max_entities = max_entities
+        self.promote_after = promote_after
+        self.decay_every = decay_every
+        self._nodes = set()
+        self._queries = Counter()
+        self._recorded = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, node):
+        return node in self._nodes
+
+    def reset(self, graph):
+        """Pick the most queried entities, then the highest-degree ones"""
+        with self._lock:
+            queried = [node for node, count in self._queries.most_common()
+                       if count >= self.promote_after]
+        queried = [node for node in queried if graph.has_node(node) and graph.degree(node)]
+        if getattr(graph, "is_compact", False):
+            hubs = graph.highest_degree(self.max_entities)
+        else:
+            hubs = heapq.nlargest(self.max_entities, graph.degree(), key=lambda item: item[1])
+        nodes = list(dict.fromkeys(queried + [node for node, degree in hubs if degree]))
+        with self._lock:
+            self._nodes = set(nodes[:self.max_entities])
+
+    def record(self, nodes):
+        """Count query matches and admit the entities that are now due.
+
+        Returns (promoted, demoted): a full set only admits an entity by
+        demoting one that queries matched less often.
+        """
+        if not self.max_entities:
+            return [], []
+        promoted, demoted = [], []
+        with self._lock:
+            for node in nodes:
+                self._queries[node] += 1
+                self._recorded += 1
+                if node in self._nodes or self._queries[node] % self.promote_after:
+                    continue
+                if len(self._nodes) >= self.max_entities:
+                    coldest = min(self._nodes, key=lambda n: (self._queries[n], str(n)))
+                    if self._queries[coldest] >= self._queries[node]:
+                        continue
+                    self._nodes.discard(coldest)
+                    demoted.append(coldest)
+                self._nodes.add(node)
+                promoted.append(node)
+            if self._recorded >= self.decay_every:
+                self._decay()
+        return promoted, demoted
+
+    def _decay(self):
+        # Halve every count and forget the entities that fall to zero
+        self._queries = Counter({node: count // 2 for node, count in self._queries.items()
+                                 if count > 1})
+        self._recorded = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entities": len(self._nodes),
+                    "queried": sum(1 for node in self._nodes if self._queries[node]),
+                    "tracked_queries": len(self._queries)}
@@ -1,18 +1,66 @@
 # src/hybrid_agent.py
 
-from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import time
+import numpy as np
+from src.context_builder import CONTEXT_TOKEN_BUDGET, pack_context, reciprocal_rank_fusion
+from src.graph_ranking import format_triple
+from src.metrics import get_metrics, timed
+
+# Bump whenever the prompt template changes so cached answers are not reused
+PROMPT_TEMPLATE_VERSION = 1
+
+
+def _run_sync(coro):
+    """Run a coroutine to completion from synchronous code"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Already inside an event loop (e.g. a notebook): use a separate thread
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
 
 class HybridRAGAgent:
-    def __init__(self, vectorstore, knowledge_graph):
+    def __init__(self, vectorstore, knowledge_graph, retrieval_cache=None,
+                 vector_timeout=None, graph_timeout=None, max_workers=8, llm=None,
+                 reranker=None, context_token_budget=CONTEXT_TOKEN_BUDGET, vector_k=5, graph_k=5,
+                 response_cache=None, metrics=None, lexical_index=None, lexical_k=5,
+                 lexical_timeout=None):
         self.vectorstore = vectorstore
         self.knowledge_graph = knowledge_graph
-        self.llm = ChatGroq(
-            model="llama3-8b-8192",
-            temperature=0,
-            api_key=os.getenv("GROQ_API_KEY")
-        )
+        self.retrieval_cache = retrieval_cache
+        # Optional ResponseCache of LLM answers keyed on the final prompt
+        self.response_cache = response_cache
+        # Stage latency histograms; defaults to the process-wide registry
+        self.metrics = metrics if metrics is not None else get_metrics()
+        # Optional CrossEncoderReranker applied to the fused candidates
+        self.reranker = reranker
+        self.context_token_budget = context_token_budget
+        self.vector_k = vector_k
+        self.graph_k = graph_k
+        # Optional BM25Index over the same chunks, searched as a third channel
+        self.lexical_index = lexical_index
+        self.lexical_k = lexical_k
+        self.lexical_timeout = lexical_timeout
+        # Per-stage timeouts in seconds; a stage that overruns contributes no results
+        self.vector_timeout = vector_timeout
+        self.graph_timeout = graph_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="hybrid-rag")
+        # Any LangChain chat model works, e.g. GenericFakeChatModel for offline runs
+        if llm is None:
+            from langchain_groq import ChatGroq
+            llm = ChatGroq(
+                model="llama3-8b-8192",
+                temperature=0,
+                api_key=os.getenv("GROQ_API_KEY")
+            )
+        self.llm = llm
         self.prompt_template = PromptTemplate(
     template="""
 You are a specialized medical assistant. Your main role is to answer health and medical questions.
@@ -40,48 +88,377 @@ Answer:
 )
 
 
-    def process_query_with_details(self, query):
+    def _index_fingerprint(self):
+        index = self.vectorstore.index
+        return (id(self.vectorstore), id(index), index.ntotal,
+                id(self.knowledge_graph.graph), getattr(self.knowledge_graph, "version", 0),
+                getattr(self.lexical_index, "fingerprint", None))
+
+    def _vector_search(self, query, check_similar=False, timings=None):
+        """Returns ([(chunk, distance)], similar_cache_hit, query_embedding)"""
+        timings = {} if timings is None else timings
+        with timed(timings, "query_embedding"):
+            embedding = self.vectorstore.embeddings.embed_query(query)
+        if check_similar:
+            cached = self.retrieval_cache.get_similar(embedding)
+            if cached is not None:
+                return None, cached, embedding
+        with timed(timings, "faiss_search"):
+            scored_docs = self.vectorstore.similarity_search_with_score_by_vector(
+                embedding, k=self.vector_k
+            )
+        return [(doc.page_content, float(score)) for doc, score in scored_docs], None, embedding
+
+    def _graph_search(self, query, timings=None):
+        return self.knowledge_graph.query_graph_scored(query, max_results=self.graph_k,
+                                                       timings=timings)
+
+    def _lexical_search(self, query):
+        return self.lexical_index.search_texts(query, self.vectorstore.docstore, k=self.lexical_k)
+
+    async def _run_stage(self, name, timeout, func, *args, timings, degraded, default=None):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
         try:
-            # Vector search
-            vector_docs = self.vectorstore.similarity_search(query, k=5)
-            vector_results = [doc.page_content for doc in vector_docs]
-
-            # Graph search
-            graph_results = self.knowledge_graph.query_graph(query, max_results=5)
-
-            # Summarise context
-            context_text = "\n---\n".join(vector_results[:2]) if vector_results else ""
-            relations_text = "\n".join(graph_results) if graph_results else ""
-
-            # LLM answer using context and graph
-            final_prompt = self.prompt_template.format(
-                context=context_text,
-                relations=relations_text,
-                question=query
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, func, *args), timeout)
+        except asyncio.TimeoutError:
+            # The worker thread finishes in the background; its result is dropped
+            degraded.append(name)
+            return default
+        except Exception:
+            # One failing store must not fail the query: answer from the other stages
+            degraded.append(name)
+            self.metrics.increment("stage_errors_total", (("stage", name),))
+            return default
+        finally:
+            timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    async def _aretrieve(self, query, vector_timeout, graph_timeout, timings, degraded):
+        """Vector, graph and (when enabled) BM25 retrieval run concurrently, served from
+        the cache when possible.
+
+        Returns ([(chunk, distance)], [((subject, relation, object), score)],
+        [(chunk, bm25)], cache_status).
+        """
+        cache = self.retrieval_cache
+        if cache is not None:
+            cache.check_fingerprint(self._index_fingerprint())
+            cached = cache.get(query)
+            if cached is not None:
+                return list(cached[0]), list(cached[1]), list(cached[2]), "hit"
+
+        check_similar = cache is not None and cache.similarity_enabled
+        # Each stage gets its own dict: a timed-out worker may still write to it later
+        vector_timings, graph_timings = {}, {}
+        stages = [
+            self._run_stage("vector", vector_timeout, self._vector_search, query, check_similar,
+                            vector_timings, timings=timings, degraded=degraded,
+                            default=([], None, None)),
+            self._run_stage("graph", graph_timeout, self._graph_search, query, graph_timings,
+                            timings=timings, degraded=degraded, default=[]),
+        ]
+        if self.lexical_index is not None:
+            stages.append(self._run_stage("lexical", self.lexical_timeout, self._lexical_search,
+                                          query, timings=timings, degraded=degraded, default=[]))
+        (vector_hits, similar, embedding), graph_hits, *lexical = await asyncio.gather(*stages)
+        lexical_hits = lexical[0] if lexical else []
+        if "vector" not in degraded:
+            timings.update(vector_timings)
+        if "graph" not in degraded:
+            timings.update(graph_timings)
+        if similar is not None:
+            return list(similar[0]), list(similar[1]), list(similar[2]), "similar_hit"
+        if cache is None:
+            return vector_hits, graph_hits, lexical_hits, None
+        # Partial results from a timed-out stage are not cached
+        if not degraded:
+            cache.put(query, (tuple(vector_hits), tuple(graph_hits), tuple(lexical_hits)),
+                      embedding)
+        return vector_hits, graph_hits, lexical_hits, "miss"
+
+    def _response_key(self, prompt):
+        """Cache key for ``prompt``, or None when answers must not be reused"""
+        if self.response_cache is None:
+            return None
+        # Only deterministic completions can be replayed
+        if getattr(self.llm, "temperature", 0) != 0:
+            return None
+        model = (getattr(self.llm, "model_name", None) or getattr(self.llm, "model", None)
+                 or type(self.llm).__name__)
+        return self.response_cache.make_key(model, PROMPT_TEMPLATE_VERSION, prompt)
+
+    def _cached_response(self, prompt, source_details):
+        """Returns (key, cached_answer); marks the lookup in ``source_details``"""
+        key = self._response_key(prompt)
+        if key is None:
+            source_details["response_cache"] = None
+            return None, None
+        answer = self.response_cache.get(key)
+        source_details["response_cache"] = "miss" if answer is None else "hit"
+        return key, answer
+
+    def _store_response(self, key, answer, degraded=()):
+        # Answers built on partial retrieval are not cached
+        if key is not None and not degraded:
+            self.response_cache.put(key, answer)
+
+    def _build_prompt(self, query, vector_hits, graph_hits, timings, lexical_hits=()):
+        """Fuse, optionally rerank, and pack the hits into the prompt.
+
+        Returns (prompt, context_stats); per-stage latency is added to ``timings``.
+        """
+        build_started = started = time.perf_counter()
+        candidates = reciprocal_rank_fusion(vector_hits, graph_hits, lexical_hits=lexical_hits)
+        timings["fusion"] = round((time.perf_counter() - started) * 1000, 2)
+
+        if self.reranker is not None:
+            started = time.perf_counter()
+            candidates = self.reranker.rerank(query, candidates)
+            timings["rerank"] = round((time.perf_counter() - started) * 1000, 2)
+
+        started = time.perf_counter()
+        context_text, relations_text, context_stats = pack_context(
+            candidates, self.context_token_budget
+        )
+        timings["pack"] = round((time.perf_counter() - started) * 1000, 2)
+
+        # LLM answer using context and graph
+        final_prompt = self.prompt_template.format(
+            context=context_text,
+            relations=relations_text,
+            question=query
+        )
+        timings["prompt_build"] = round((time.perf_counter() - build_started) * 1000, 2)
+        return final_prompt, context_stats
+
+    async def _aprepare(self, query, vector_timeout, graph_timeout, timings):
+        """Retrieve context and build the final prompt; returns (prompt, source_details)"""
+        vector_timeout = vector_timeout if vector_timeout is not None else self.vector_timeout
+        graph_timeout = graph_timeout if graph_timeout is not None else self.graph_timeout
+        degraded = []
+        vector_hits, graph_hits, lexical_hits, cache_status = await self._aretrieve(
+            query, vector_timeout, graph_timeout, timings, degraded
+        )
+        final_prompt, context_stats = self._build_prompt(query, vector_hits, graph_hits, timings,
+                                                         lexical_hits)
+        vector_results = [text for text, _ in vector_hits]
+        graph_results = [format_triple(triple) for triple, _ in graph_hits]
+        lexical_results = [text for text, _ in lexical_hits]
+
+        source_details = {
+            "vector_results": vector_results,
+            "graph_results": graph_results,
+            "lexical_results": lexical_results,
+            "query": query,
+            "route": self._get_route(vector_results, graph_results, lexical_results),
+            "retrieval_cache": cache_status,
+            "degraded_stages": degraded,
+            "context": context_stats,
+            "timings": timings
+        }
+        return final_prompt, source_details
+
+    def _error_details(self, query):
+        return {
+            "vector_results": [],
+            "graph_results": [],
+            "lexical_results": [],
+            "query": query,
+            "route": "error"
+        }
+
+    async def aprocess_query_with_details(self, query, vector_timeout=None, graph_timeout=None):
+        started = time.perf_counter()
+        timings = {}
+        try:
+            final_prompt, source_details = await self._aprepare(
+                query, vector_timeout, graph_timeout, timings
             )
             
-            # GROQ Completion
-            response = self.llm.invoke(final_prompt)
-            answer = response.content
+            key, answer = self._cached_response(final_prompt, source_details)
+            if answer is None:
+                # GROQ Completion; not on self._executor, so retrieval stages never
+                # queue behind LLM calls and their timeouts measure only their own work
+                llm_started = time.perf_counter()
+                response = await self.llm.ainvoke(final_prompt)
+                answer = response.content
+                timings["llm"] = round((time.perf_counter() - llm_started) * 1000, 2)
+                self._store_response(key, answer, source_details["degraded_stages"])
+            timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+            self.metrics.record(source_details)
+            return answer, source_details
+        except Exception as e:
+            error_response = f"Error processing query: {str(e)}"
+            source_details = self._error_details(query)
+            self.metrics.record(source_details)
+            return error_response, source_details
+
+    def process_query_with_details(self, query, vector_timeout=None, graph_timeout=None):
+        return _run_sync(self.aprocess_query_with_details(query, vector_timeout, graph_timeout))
+
+    def stream_query_with_details(self, query, vector_timeout=None, graph_timeout=None):
+        """Yield ("details", source_details) once retrieval is done, then ("token", text)
+        for each streamed piece of the answer, then ("done", full_answer)."""
+        started = time.perf_counter()
+        timings = {}
+        try:
+            final_prompt, source_details = _run_sync(
+                self._aprepare(query, vector_timeout, graph_timeout, timings)
+            )
+            key, cached = self._cached_response(final_prompt, source_details)
+        except Exception as e:
+            error_response = f"Error processing query: {str(e)}"
+            source_details = self._error_details(query)
+            self.metrics.record(source_details)
+            yield "details", source_details
+            yield "token", error_response
+            yield "done", error_response
+            return
+
+        yield "details", source_details
+        if cached is not None:
+            timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+            self.metrics.record(source_details)
+            yield "token", cached
+            yield "done", cached
+            return
+
+        pieces = []
+        failed = False
+        llm_started = time.perf_counter()
+        try:
+            for chunk in self.llm.stream(final_prompt):
+                if not chunk.content:
+                    continue
+                if not pieces:
+                    timings["llm_ttft"] = round((time.perf_counter() - llm_started) * 1000, 2)
+                pieces.append(chunk.content)
+                yield "token", chunk.content
+        except Exception as e:
+            error_response = f"Error processing query: {str(e)}"
+            pieces.append(f"\n\n{error_response}")
+            failed = True
+            yield "token", pieces[-1]
+        timings["llm"] = round((time.perf_counter() - llm_started) * 1000, 2)
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+        answer = "".join(pieces)
+        if not failed:
+            self._store_response(key, answer, source_details["degraded_stages"])
+        self.metrics.record(source_details)
+        yield "done", answer
+
+    def _vector_search_batch(self, queries):
+        """One batched encoder call and one FAISS search over the query matrix.
+
+        Returns [(chunk, distance)] per query.
+        """
+        vectors = np.asarray(self.vectorstore.embeddings.embed_documents(queries), dtype=np.float32)
+        if getattr(self.vectorstore, "_normalize_L2", False):
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        distances, indices = self.vectorstore.index.search(vectors, self.vector_k)
+        results = []
+        for row_distances, row in zip(distances, indices):
+            hits = []
+            for distance, i in zip(row_distances, row):
+                if i == -1:
+                    continue
+                doc = self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[i])
+                hits.append((doc.page_content, float(distance)))
+            results.append(hits)
+        return results
 
+    def _timed_invoke(self, prompt):
+        started = time.perf_counter()
+        key = self._response_key(prompt)
+        answer = self.response_cache.get(key) if key is not None else None
+        if answer is not None:
+            return answer, "hit", 0.0
+        try:
+            answer = self.llm.invoke(prompt).content
+            self._store_response(key, answer)
+        except Exception as e:
+            answer = f"Error processing query: {str(e)}"
+        status = None if key is None else "miss"
+        return answer, status, round((time.perf_counter() - started) * 1000, 2)
+
+    def process_queries(self, queries, max_concurrency=8):
+        """Answer a batch of queries; returns [(answer, source_details), ...] in order.
+
+        Retrieval is batched across the whole list and LLM calls run through a
+        pool of at most ``max_concurrency`` requests. The retrieval cache is
+        bypassed; the response cache is still consulted per prompt.
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+
+        started = time.perf_counter()
+        all_vector_hits = self._vector_search_batch(queries)
+        vector_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        started = time.perf_counter()
+        all_graph_hits = self.knowledge_graph.query_graph_many(queries, max_results=self.graph_k,
+                                                               scored=True)
+        graph_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        # Batched stages are shared by the whole batch: copied into every answer's
+        # timings, but observed once
+        batch_timings = {"vector_batch": vector_ms, "graph_batch": graph_ms}
+        all_lexical_hits = [[] for _ in queries]
+        if self.lexical_index is not None:
+            started = time.perf_counter()
+            all_lexical_hits = [self._lexical_search(query) for query in queries]
+            batch_timings["lexical_batch"] = round((time.perf_counter() - started) * 1000, 2)
+        self.metrics.record_batch(batch_timings)
+
+        prompts = []
+        all_timings = []
+        all_context_stats = []
+        for query, vector_hits, graph_hits, lexical_hits in zip(queries, all_vector_hits,
+                                                                all_graph_hits, all_lexical_hits):
+            timings = {**batch_timings, "batch_size": len(queries)}
+            prompt, context_stats = self._build_prompt(query, vector_hits, graph_hits, timings,
+                                                       lexical_hits)
+            prompts.append(prompt)
+            all_timings.append(timings)
+            all_context_stats.append(context_stats)
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            completions = list(pool.map(self._timed_invoke, prompts))
+
+        results = []
+        for query, vector_hits, graph_hits, lexical_hits, timings, context_stats, (
+                answer, response_cache, llm_ms) in zip(
+                queries, all_vector_hits, all_graph_hits, all_lexical_hits, all_timings,
+                all_context_stats, completions):
+            vector_results = [text for text, _ in vector_hits]
+            graph_results = [format_triple(triple) for triple, _ in graph_hits]
+            lexical_results = [text for text, _ in lexical_hits]
+            timings["llm"] = llm_ms
             source_details = {
                 "vector_results": vector_results,
                 "graph_results": graph_results,
+                "lexical_results": lexical_results,
                 "query": query,
-                "route": self._get_route(vector_results, graph_results)
-            }
-            return answer, source_details
-        except Exception as e:
-            error_response = f"Error processing query: {str(e)}"
-            empty_details = {
-                "vector_results": [],
-                "graph_results": [],
-                "query": query,
-                "route": "error"
+                "route": self._get_route(vector_results, graph_results, lexical_results),
+                "response_cache": response_cache,
+                "context": context_stats,
+                "timings": timings
             }
-            return error_response, empty_details
+            self.metrics.record(source_details)
+            results.append((answer, source_details))
+        return results
 
-    def _get_route(self, vector_results, graph_results):
+    def _get_route(self, vector_results, graph_results, lexical_results=()):
+        if lexical_results:
+            # BM25 contributed: "all", "vector_lexical", "graph_lexical" or "lexical_only"
+            if vector_results and graph_results:
+                return "all"
+            if vector_results:
+                return "vector_lexical"
+            if graph_results:
+                return "graph_lexical"
+            return "lexical_only"
         if graph_results and vector_results:
             return "both"
         elif vector_results:
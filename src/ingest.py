@@ -0,0 +1,236 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from langchain_community.vectorstores import FAISS
+from src.chunk_store import use_chunk_store
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+MANIFEST_FILE = "ingest_manifest.json"
+
+_DONE = object()
+
+
+def make_text_splitter():
+    # PDF parsing and splitting are imported only when something is ingested
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len
+    )
+
+
+def count_pages(pdf_path):
+    from pypdf import PdfReader
+
+    return len(PdfReader(pdf_path).pages)
+
+
+def parse_page_range(pdf_path, start, end):
+    """Extract and split pages [start, end) into (page, sha256, chunks) records"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    splitter = make_text_splitter()
+    pages = []
+    for page_num in range(start, end):
+        text = reader.pages[page_num].extract_text()
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        # Same per-page split and metadata as PyPDFLoader + split_documents
+        chunks = [(piece, {"source": pdf_path, "page": page_num})
+                  for piece in splitter.split_text(text)]
+        pages.append((page_num, digest, chunks))
+    return pages
+
+
+def iter_pdf_pages(pdf_path, total_pages, workers=None, pages_per_task=16, max_pending=None,
+                   task=parse_page_range, initializer=None, initargs=()):
+    """Yield page records in order while a process pool parses ahead.
+
+    At most ``max_pending`` page ranges are in flight, so memory does not grow
+    with the size of the PDF. ``task(pdf_path, start, end)`` must be a
+    module-level function returning a list of records; it defaults to
+    ``parse_page_range``.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    ranges = iter([(start, min(start + pages_per_task, total_pages))
+                   for start in range(0, total_pages, pages_per_task)])
+
+    # spawn: the parent may already hold torch/tokenizer threads, which fork does not copy safely
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(pool.submit(task, pdf_path, start, end))
+            if len(pending) >= max_pending:
+                break
+        while pending:
+            pages = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(pool.submit(task, pdf_path, *next_range))
+            yield from pages
+
+
+def load_ingest_manifest(persist_dir):
+    path = os.path.join(persist_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(vectorstore, persist_dir, manifest):
+    """Persist the index first, then the manifest that describes it"""
+    vectorstore.save_local(persist_dir)
+    path = os.path.join(persist_dir, MANIFEST_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def page_chunk_id(page_num, digest, position):
+    return f"p{page_num}-{digest[:16]}-{position}"
+
+
+def _produce(chunk_iter, chunk_queue, errors, stop):
+    try:
+        for chunk in chunk_iter:
+            if stop.is_set():
+                break
+            chunk_queue.put(chunk)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        chunk_iter.close()
+        chunk_queue.put(_DONE)
+
+
+def ingest_pdf_streaming(pdf_path, embeddings, persist_dir, vectorstore=None, manifest=None,
+                         batch_size=64, workers=None, pages_per_task=16, queue_size=256,
+                         checkpoint_every=50, log_every=20):
+    """Build or update a FAISS vectorstore from a PDF with checkpointing.
+
+    Pages whose text hash matches ``manifest`` are skipped, changed pages have
+    their old vectors replaced, and progress is saved every
+    ``checkpoint_every`` batches so an interrupted build resumes where it stopped.
+    """
+    manifest = manifest or {"version": 1, "pages": {}}
+    was_complete = manifest.get("complete", False)
+    manifest["source"] = pdf_path
+    manifest["complete"] = False
+    pages = manifest["pages"]
+    existing_ids = set(vectorstore.index_to_docstore_id.values()) if vectorstore else set()
+
+    total_pages = count_pages(pdf_path)
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    errors = []
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce,
+        args=(iter_pdf_pages(pdf_path, total_pages, workers, pages_per_task),
+              chunk_queue, errors, stop),
+        daemon=True
+    )
+    producer.start()
+
+    stats = {"embedded": 0, "skipped_pages": 0, "replaced_pages": 0, "batches": 0}
+    started = time.time()
+    batch = []
+    batch_pages = []
+    stale_ids = []
+
+    def delete_stale():
+        nonlocal stale_ids
+        stale = [i for i in dict.fromkeys(stale_ids) if i in existing_ids]
+        if stale and vectorstore is not None:
+            vectorstore.delete(stale)
+            existing_ids.difference_update(stale)
+        stale_ids = []
+
+    def flush():
+        nonlocal vectorstore
+        delete_stale()
+        if batch:
+            texts = [text for (text, _), _ in batch]
+            metadatas = [metadata for (_, metadata), _ in batch]
+            ids = [chunk_id for _, chunk_id in batch]
+            vectors = embeddings.embed_documents(texts)
+            if vectorstore is None:
+                vectorstore = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings,
+                                                    metadatas=metadatas, ids=ids)
+                # Chunk text lives in the mmap chunk store, not in the pickled docstore
+                use_chunk_store(vectorstore, persist_dir)
+            else:
+                vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+            existing_ids.update(ids)
+            stats["embedded"] += len(batch)
+        # Every chunk of these pages is now in the index
+        for page_num, digest, ids in batch_pages:
+            pages[str(page_num)] = {"sha256": digest, "ids": ids}
+        batch.clear()
+        batch_pages.clear()
+        stats["batches"] += 1
+        if stats["batches"] % log_every == 0:
+            elapsed = time.time() - started
+            print(f"  🧩 {stats['embedded']} chunks embedded "
+                  f"({stats['embedded'] / elapsed:.1f} chunks/sec)")
+        if stats["batches"] % checkpoint_every == 0 and vectorstore is not None:
+            save_checkpoint(vectorstore, persist_dir, manifest)
+
+    try:
+        while True:
+            item = chunk_queue.get()
+            if item is _DONE:
+                break
+            page_num, digest, chunks = item
+            entry = pages.get(str(page_num))
+            if entry and entry["sha256"] == digest:
+                stats["skipped_pages"] += 1
+                continue
+            if entry:
+                stale_ids.extend(entry["ids"])
+                stats["replaced_pages"] += 1
+            ids = [page_chunk_id(page_num, digest, j) for j in range(len(chunks))]
+            # Vectors saved by a checkpoint whose manifest write never happened
+            stale_ids.extend(ids)
+            batch.extend(zip(chunks, ids))
+            batch_pages.append((page_num, digest, ids))
+            if len(batch) >= batch_size:
+                flush()
+
+        for page_key in [k for k in pages if int(k) >= total_pages]:
+            stale_ids.extend(pages.pop(page_key)["ids"])
+        if batch or batch_pages or stale_ids:
+            flush()
+    except BaseException:
+        # Unblock the producer so the process pool shuts down
+        stop.set()
+        while chunk_queue.get() is not _DONE:
+            pass
+        raise
+    finally:
+        producer.join()
+
+    if errors:
+        raise errors[0]
+    if vectorstore is None:
+        raise ValueError(f"No text could be extracted from {pdf_path}")
+
+    manifest["complete"] = True
+    if stats["batches"] or not was_complete:
+        save_checkpoint(vectorstore, persist_dir, manifest)
+    print(f"📋 Embedded {stats['embedded']} chunks "
+          f"({stats['skipped_pages']} pages unchanged, {stats['replaced_pages']} pages replaced)")
+    return vectorstore
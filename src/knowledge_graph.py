@@ -1,123 +1,345 @@
+import json
 import os
 import pickle
 import networkx as nx
-from transformers import pipeline
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import re
-import json
+import threading
 from collections import defaultdict
+from functools import cached_property
 import streamlit as st
+from src.node_index import NodeIndex
+from src.entity_extractor import MedicalEntityExtractor, vocabulary_from_sources
+from src.biored_converter import RELATIONS_OUTPUT, iter_relations
+from src.cache import LRUTTLCache
+from src.hot_entities import HOT_ENTITIES, PROMOTE_MIN_MATCH, HotEntities
+from src.metrics import timed
+from src.graph_ranking import (
+    best_first_triples, format_triple, match_score, query_relations, ranked_edges
+)
+from src.graph_store import (
+    compact_graph, file_digest, load_graph, load_manifest, load_source_edges, save_graph,
+    save_manifest, save_source_edges
+)
+
+# The curated relations plus the BioRED conversion, when present
+RELATIONS_FILES = ("medical_relations.json", RELATIONS_OUTPUT)
 
-class KnowledgeGraph:
-    def __init__(self):
-        try:
-            self.ner_pipeline = pipeline(
-                "token-classification",
-                "blaze999/Medical-NER",
-                aggregation_strategy="simple",
-                device=-1
-            )
-        except Exception:
-            self.ner_pipeline = None
 
+class KnowledgeGraph:
+    def __init__(self, hot_entities=HOT_ENTITIES):
         self.graph = nx.MultiDiGraph()
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.node_index = NodeIndex()
+        self._index_lock = threading.Lock()
+        self.manifest = {"sources": {}}
+        # {source: [[entity, relation, target], ...]}, read from the graph's .edges.json
+        # sidecar only when a source changed and its removed relations must be found
+        self.source_edges = None
+        self.persist_file = None
+        self.version = 0  # bumped on every mutation, used to invalidate caches
+        self.entity_extractor = MedicalEntityExtractor()
+        # Ranked edge lists per node; hub and frequently queried entities are pinned
+        self._edge_cache = LRUTTLCache(max_entries=4096, ttl_seconds=0)
+        self.hot_entities = HotEntities(max_entities=hot_entities)
+        self._edge_lock = threading.Lock()
+        self._synced = None          # (graph id, version) the edge cache reflects
+        self._dirty_nodes = set()    # nodes whose edges changed since then
+        self._dirty_version = 0      # version of the last tracked mutation
+
+    @cached_property
+    def text_splitter(self):
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        return RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=100
         )
 
     def extract_medical_entities(self, text):
-        entities = {"diseases": [], "symptoms": [], "treatments": [], "anatomy": []}
-
-        disease_patterns = [
-            r'\b(diabetes|cancer|hypertension|asthma|arthritis|pneumonia|fever|malaria|tuberculosis)\b',
-            r'\b(covid|corona|influenza|hepatitis|bronchitis|gastritis|dermatitis)\b',
-            r'\b(\w+itis|\w+osis|\w+emia|\w+pathy)\b',
-        ]
-
-        treatment_patterns = [
-            r'\b(insulin|aspirin|antibiotics|chemotherapy|surgery|ibuprofen|acetaminophen|paracetamol)\b',
-            r'\b(treatment|therapy|medicine|medication|drug|remedy)\b',
-            r'\b(\w+mycin|\w+cillin|\w+azole)\b',
-        ]
-
-        symptom_patterns = [
-            r'\b(pain|fever|nausea|fatigue|headache|cough|chills|sweating|vomiting|dizziness)\b',
-            r'\b(high blood pressure|chest pain|shortness of breath|stomach pain|back pain)\b',
-        ]
-
-        text_lower = text.lower()
-        for pattern in disease_patterns:
-            matches = re.findall(pattern, text_lower, re.IGNORECASE)
-            entities["diseases"].extend([m.strip() for m in matches if len(m.strip()) > 2])
-        for pattern in treatment_patterns:
-            matches = re.findall(pattern, text_lower, re.IGNORECASE)
-            entities["treatments"].extend([m.strip() for m in matches if len(m.strip()) > 2])
-        for pattern in symptom_patterns:
-            matches = re.findall(pattern, text_lower, re.IGNORECASE)
-            entities["symptoms"].extend([m.strip() for m in matches if len(m.strip()) > 2])
-        for key in entities:
-            entities[key] = list(set([e.lower().strip() for e in entities[key] if len(e.strip()) > 2]))
-        return entities
+        return self.entity_extractor.extract(text)
+
+    def refresh_entity_vocabulary(self, relations_files=RELATIONS_FILES):
+        """Recompile the extractor with every entity name in the graph and relation files"""
+        extra_terms = vocabulary_from_sources(self.graph, relations_files)
+        self.entity_extractor = MedicalEntityExtractor(extra_terms)
+        return self.entity_extractor
+
+    def _mutable_graph(self):
+        # Memory-mapped graphs are read-only; copy into networkx on first write
+        if getattr(self.graph, "is_compact", False):
+            indexed = self.node_index.graph_id == id(self.graph)
+            synced = self._synced is not None and self._synced[0] == id(self.graph)
+            self.graph = self.graph.to_networkx()
+            if indexed:
+                self.node_index.graph_id = id(self.graph)
+            if synced:
+                self._synced = (id(self.graph), self._synced[1])
+        return self.graph
+
+    def _touch(self, *nodes):
+        # Record a mutation; only ``nodes`` and their neighbours need their ranked edges redone
+        self.version += 1
+        self._dirty_nodes.update(nodes)
+        self._dirty_version = self.version
+
+    def _add_node(self, node, **attrs):
+        self._mutable_graph().add_node(node, **attrs)
+        self._touch()  # a node without edges changes no ranking
+        if self.node_index.graph_id == id(self.graph):
+            self.node_index.add(node)
+
+    def _ensure_node_index(self):
+        # Built on the first lookup, so loading a graph does not pay for it.
+        # Rebuild when the graph was swapped (e.g. unpickled) or mutated directly
+        with self._index_lock:
+            if (self.node_index.graph_id != id(self.graph) or
+                    len(self.node_index) != self.graph.number_of_nodes()):
+                self.node_index.rebuild(self.graph)
+        return self.node_index
+
+    def _has_relation(self, u, v, relation):
+        edge_data = self.graph.get_edge_data(u, v) or {}
+        return any(d.get("relation") == relation for d in edge_data.values())
+
+    def _add_relation(self, u, v, relation):
+        # Skip parallel duplicates so repeated merges don't grow the graph
+        if not self._has_relation(u, v, relation):
+            self._mutable_graph().add_edge(u, v, relation=relation)
+            self._touch(u, v)
+
+    def _remove_relation(self, u, v, relation):
+        edge_data = self.graph.get_edge_data(u, v) or {}
+        keys = [k for k, d in edge_data.items() if d.get("relation") == relation]
+        for key in keys:
+            self._mutable_graph().remove_edge(u, v, key=key)
+            self._touch(u, v)
+
+    def _parse_relations(self, relations_file):
+        """Yield cleaned (entity, relation, target) triples; JSONL files are streamed"""
+        for entity, rel_type, target in iter_relations(relations_file):
+            if not isinstance(entity, str) or not isinstance(target, str):
+                continue
+            entity_clean = entity.lower().strip()
+            target_clean = target.lower().strip()
+            if len(entity_clean) > 1 and len(target_clean) > 1:
+                yield entity_clean, rel_type, target_clean
 
     def load_external_relations(self, relations_file="medical_relations.json"):
+        """Merge a relations file, skipping it when its content hash is unchanged.
+
+        Accepts the ``{entity: {relation: [targets]}}`` JSON file or the JSONL
+        written by src/biored_converter.py. Returns True if the graph was modified.
+        """
         if not os.path.exists(relations_file):
-            return
-        
-        with open(relations_file, "r", encoding="utf-8") as f:
-            relations = json.load(f)
+            return False
 
-        for entity, entity_relations in relations.items():
-            entity_clean = entity.lower().strip()
-            if len(entity_clean) > 1:
-                self.graph.add_node(entity_clean, type="medical_entity", source="biored")
-                for rel_type, targets in entity_relations.items():
-                    if isinstance(targets, list):
-                        for target in targets:
-                            if target and isinstance(target, str) and len(target.strip()) > 1:
-                                target_clean = target.lower().strip()
-                                self.graph.add_node(target_clean, type="related_entity", source="biored")
-                                self.graph.add_edge(entity_clean, target_clean, relation=rel_type)
-                                self.graph.add_edge(target_clean, entity_clean, relation=f"inverse_{rel_type}")
-
-    def build_graph_from_pdf(self, pdf_path, persist_file="knowledge_graph.pkl"):
-        if os.path.exists(persist_file):
-            with open(persist_file, "rb") as f:
-                self.graph = pickle.load(f)
-            self.load_external_relations()
-            with open(persist_file, "wb") as f:
-                pickle.dump(self.graph, f)
+        source_key = os.path.normpath(relations_file)
+        stat = os.stat(relations_file)
+        file_info = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+        sources = self.manifest.setdefault("sources", {})
+        previous = sources.get(source_key)
+        if previous and all(previous.get(k) == v for k, v in file_info.items()):
+            return False
+        digest = file_digest(relations_file)
+        if previous and previous["sha256"] == digest:
+            previous.update(file_info)  # touched, not edited
+            return False
+        source_edges = self._loaded_source_edges()
+
+        # Single streaming pass; removals never touch the edges added here
+        new_edges = set()
+        last_entity = None
+        for entity_clean, rel_type, target_clean in self._parse_relations(relations_file):
+            if entity_clean != last_entity:
+                self._add_node(entity_clean, type="medical_entity", source="biored")
+                last_entity = entity_clean
+            self._add_node(target_clean, type="related_entity", source="biored")
+            self._add_relation(entity_clean, target_clean, rel_type)
+            self._add_relation(target_clean, entity_clean, f"inverse_{rel_type}")
+            new_edges.add((entity_clean, rel_type, target_clean))
+
+        removed = set()
+        if previous:
+            still_provided = set()
+            for key, edges in source_edges.items():
+                if key != source_key:
+                    still_provided.update(tuple(e) for e in edges)
+            removed = ({tuple(e) for e in source_edges.get(source_key, ())} -
+                       new_edges - still_provided)
+
+        for entity, rel_type, target in removed:
+            self._remove_relation(entity, target, rel_type)
+            self._remove_relation(target, entity, f"inverse_{rel_type}")
+
+        sources[source_key] = {"sha256": digest, **file_info}
+        source_edges[source_key] = sorted(new_edges)
+        print(f"🔗 Merged {relations_file}: {len(new_edges)} relations, {len(removed)} removed")
+        return True
+
+    def _loaded_source_edges(self):
+        if self.source_edges is None:
+            self.source_edges = load_source_edges(self.persist_file) if self.persist_file else {}
+        return self.source_edges
+
+    def add_corpus_entities(self, entity_types, pairs):
+        """Add extracted entities and weighted co_occurs_with edges in both directions"""
+        from src.graph_builder import CO_OCCURRENCE_RELATION
+
+        for node, entity_type in entity_types.items():
+            self._add_node(node, type=entity_type, source="pdf")
+        graph = self._mutable_graph()
+        for (a, b), count in pairs.items():
+            graph.add_edge(a, b, relation=CO_OCCURRENCE_RELATION, weight=float(count))
+            graph.add_edge(b, a, relation=CO_OCCURRENCE_RELATION, weight=float(count))
+        # Bulk change: not tracked per node, so the whole edge cache is dropped
+        self.version += 1
+
+    def build_graph_from_pdf(self, pdf_path, persist_file="knowledge_graph.kgb",
+                             legacy_pickle="knowledge_graph.pkl",
+                             relations_files=RELATIONS_FILES,
+                             full_corpus=False, ner_workers=None, ner_batch_size=32,
+                             use_ner=True, min_cooccurrence=2):
+        """Load the persisted graph, or build it from the PDF.
+
+        By default a fresh build scans the first 50 chunks with the dictionary
+        extractor. ``full_corpus=True`` runs batched NER over every chunk in a
+        process pool (see src.graph_builder) and adds co-occurrence edges.
+        """
+        self.persist_file = persist_file
+        if os.path.exists(persist_file) or os.path.exists(legacy_pickle):
+            changed = False
+            if os.path.exists(persist_file):
+                self.graph = load_graph(persist_file)
+                self.manifest = load_manifest(persist_file)
+                manifest_before = json.dumps(self.manifest, sort_keys=True)
+                # Older manifests kept each source's relations inline; move them to the sidecar
+                legacy_edges = {key: entry.pop("edges")
+                                for key, entry in self.manifest.get("sources", {}).items()
+                                if "edges" in entry}
+                if legacy_edges:
+                    self.source_edges = legacy_edges
+            else:
+                print(f"📦 Converting legacy graph {legacy_pickle} -> {persist_file}")
+                with open(legacy_pickle, "rb") as f:
+                    self.graph = compact_graph(pickle.load(f))
+                manifest_before = None
+                changed = True
+            for relations_file in relations_files:
+                changed = self.load_external_relations(relations_file) or changed
+            if changed:
+                save_graph(self.graph, persist_file)
+            if changed or json.dumps(self.manifest, sort_keys=True) != manifest_before:
+                save_manifest(persist_file, self.manifest)
+            if self.source_edges is not None:
+                save_source_edges(persist_file, self.source_edges)
             return self.graph
 
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
-        chunks = self.text_splitter.split_documents(documents)
+        self.source_edges = {}
+        if full_corpus:
+            from src.graph_builder import extract_corpus
 
-        all_entities = defaultdict(set)
-        for chunk in chunks[:50]:
-            text = chunk.page_content
-            entities = self.extract_medical_entities(text)
-            for k, v in entities.items():
-                all_entities[k].update(v)
-        
-        for k, node_set in all_entities.items():
-            for node in node_set:
-                if len(node) > 2:
-                    self.graph.add_node(node, type=k, source="pdf")
+            extra_terms = vocabulary_from_sources(self.graph, relations_files)
+            entity_types, pairs, _ = extract_corpus(
+                pdf_path, extra_terms, workers=ner_workers, batch_size=ner_batch_size,
+                use_ner=use_ner, min_cooccurrence=min_cooccurrence
+            )
+            self.add_corpus_entities(entity_types, pairs)
+        else:
+            from langchain_community.document_loaders import PyPDFLoader
+
+            loader = PyPDFLoader(pdf_path)
+            documents = loader.load()
+            chunks = self.text_splitter.split_documents(documents)
+
+            self.refresh_entity_vocabulary(relations_files)
+            all_entities = defaultdict(set)
+            for chunk in chunks[:50]:
+                text = chunk.page_content
+                entities = self.extract_medical_entities(text)
+                for k, v in entities.items():
+                    all_entities[k].update(v)
 
-        self.load_external_relations()
+            for k, node_set in all_entities.items():
+                for node in node_set:
+                    if len(node) > 2:
+                        self._add_node(node, type=k, source="pdf")
+
+        for relations_file in relations_files:
+            self.load_external_relations(relations_file)
         
-        with open(persist_file, "wb") as f:
-            pickle.dump(self.graph, f)
+        save_graph(self.graph, persist_file)
+        save_manifest(persist_file, self.manifest)
+        save_source_edges(persist_file, self.source_edges)
         return self.graph
 
-    def query_graph(self, query, max_results=5):  # ✅ Fixed indentation
+    def _affected_nodes(self, nodes):
+        # An edge change alters the endpoints' degrees, which rank their neighbours' edges
+        affected = set()
+        for node in nodes:
+            affected.add(node)
+            if self.graph.has_node(node):
+                affected.update(self.graph.successors(node))
+                affected.update(self.graph.predecessors(node))
+        return affected
+
+    def _sync_edge_cache(self):
+        """Bring the edge cache and hot entity set up to date with the graph.
+
+        Called by every graph query, so loading a graph stays a page-in; edge
+        lists are ranked on first use.
+        """
+        if self._synced == (id(self.graph), self.version):
+            return
+        with self._edge_lock:
+            graph_id, version = id(self.graph), self.version
+            if self._synced == (graph_id, version):
+                return
+            if (self._synced is None or self._synced[0] != graph_id or
+                    self._dirty_version != version):
+                # A new graph, or a bulk change without per-node tracking
+                self._edge_cache.clear()
+                self.hot_entities.reset(self.graph)
+            else:
+                for node in self._affected_nodes(self._dirty_nodes):
+                    self._edge_cache.pop(node)
+            self._dirty_nodes.clear()
+            self._synced = (graph_id, version)
+
+    def _ranked_edges(self, node):
+        edges = self._edge_cache.get(node)
+        if edges is None:
+            edges = ranked_edges(self.graph, node)
+            if node in self.hot_entities:
+                self._edge_cache.pin(node, edges)
+            else:
+                self._edge_cache.put(node, edges)
+        return edges
+
+    def _record_seeds(self, seeds):
+        # Entities that queries keep matching strongly are pinned like the hubs
+        promoted, demoted = self.hot_entities.record(node for score, node in seeds
+                                                     if score >= PROMOTE_MIN_MATCH)
+        if promoted or demoted:
+            with self._edge_lock:
+                for node in demoted:
+                    self._edge_cache.unpin(node)
+                for node in promoted:
+                    edges = self._edge_cache.pop(node)
+                    if edges is not None:
+                        self._edge_cache.pin(node, edges)
+
+    def query_graph_scored(self, query, max_results=5, max_hops=2, max_seeds=15, timings=None):
+        """Top triples for a query as [((subject, relation, object), score)], best first.
+
+        Matched nodes are scored by how well they fit the query, then expanded
+        best first for up to ``max_hops`` hops (see src/graph_ranking.py).
+        Inverse edges are reported in their forward form, so each fact appears once.
+        ``graph_matching`` and ``graph_expansion`` milliseconds are added to ``timings``.
+        """
         if self.graph.number_of_nodes() == 0:
             return []
+        timings = {} if timings is None else timings
+        self._sync_edge_cache()
 
         query_lower = query.lower()
-        relevant_nodes = set()
         
         # Extract medical keywords from query - BETTER APPROACH
         medical_keywords = []
@@ -126,57 +348,51 @@ class KnowledgeGraph:
             if len(word) > 2 and word not in ['what', 'is', 'are', 'the', 'for', 'about', 'tell', 'me']:
                 medical_keywords.append(word)
         
-        # Find nodes using keywords
-        for node in self.graph.nodes():
-            node_lower = str(node).lower()
-            # Check if any keyword matches node
-            if any(keyword in node_lower or node_lower in keyword for keyword in medical_keywords):
-                relevant_nodes.add(node)
-            # Original exact matching logic too
-            if (query_lower == node_lower or 
-                query_lower in node_lower or 
-                node_lower in query_lower):
-                relevant_nodes.add(node)
-
-        results = []
-        for node in list(relevant_nodes)[:15]:
-            # Get neighbors and predecessors
-            for neighbor in self.graph.neighbors(node):
-                edge_data = self.graph.get_edge_data(node, neighbor)
-                if edge_data:
-                    for edge_info in edge_data.values():
-                        if edge_info:  # Check if edge_info is not None
-                            relation = edge_info.get("relation", "related_to")
-                            results.append(f"{node} {relation} {neighbor}")
-            
-            for pred in self.graph.predecessors(node):
-                edge_data = self.graph.get_edge_data(pred, node)
-                if edge_data:
-                    for edge_info in edge_data.values():
-                        if edge_info:  # Check if edge_info is not None
-                            relation = edge_info.get("relation", "related_to")
-                            results.append(f"{pred} {relation} {node}")
-
-        return list(set(results))[:max_results]
+        with timed(timings, "graph_matching"):
+            # Find nodes whose name contains, or is contained in, a keyword or the query
+            relevant_nodes = self._ensure_node_index().match(query_lower, medical_keywords)
+
+            seeds = sorted(((match_score(node, query_lower, medical_keywords), node)
+                            for node in relevant_nodes),
+                           key=lambda seed: (-seed[0], str(seed[1])))[:max_seeds]
+            self._record_seeds(seeds)
+        with timed(timings, "graph_expansion"):
+            ranked = best_first_triples(seeds, self._ranked_edges, max_results=max_results,
+                                        max_hops=max_hops, focus=query_relations(query_lower))
+        return [(triple, round(score, 4)) for score, triple in ranked]
+
+    def query_graph(self, query, max_results=5):
+        """The same triples as ``query_graph_scored``, rendered as text"""
+        return [format_triple(triple) for triple, _ in self.query_graph_scored(query, max_results)]
+
+    def query_graph_many(self, queries, max_results=5, scored=False):
+        """query_graph (or query_graph_scored) over a batch, resolving each distinct query once"""
+        self._ensure_node_index()
+        search = self.query_graph_scored if scored else self.query_graph
+        resolved = {}
+        for query in queries:
+            key = query.lower()
+            if key not in resolved:
+                resolved[key] = search(query, max_results=max_results)
+        return [list(resolved[query.lower()]) for query in queries]
 
     def get_graph_stats(self):
-        node_types = nx.get_node_attributes(self.graph, "type")
-        node_sources = nx.get_node_attributes(self.graph, "source")
-        
         type_counts = defaultdict(int)
         source_counts = defaultdict(int)
         
-        for node_type in node_types.values():
-            type_counts[node_type] += 1
-        for source in node_sources.values():
-            source_counts[source] += 1
+        for _, data in self.graph.nodes(data=True):
+            if "type" in data:
+                type_counts[data["type"]] += 1
+            if "source" in data:
+                source_counts[data["source"]] += 1
 
         return {
             "nodes": self.graph.number_of_nodes(),
             "edges": self.graph.number_of_edges(),
-            "node_types": len(set(node_types.values())),
+            "node_types": len(type_counts),
             "type_breakdown": dict(type_counts),
-            "source_breakdown": dict(source_counts)
+            "source_breakdown": dict(source_counts),
+            "hot_entities": len(self.hot_entities)
         }
 
 @st.cache_resource
@@ -0,0 +1,215 @@
+"""In-process latency histograms for the query path, exportable as Prometheus text.
+
+The agent records each answer's ``timings`` (milliseconds per stage) here:
+
+- ``query_embedding``, ``faiss_search``: vector retrieval
+- ``graph_matching``, ``graph_expansion``: seed lookup and best-first expansion
+- ``lexical``: BM25 search, when the agent has a lexical index
+- ``prompt_build``: fusion, optional rerank, packing and formatting
+- ``llm_ttft``, ``llm``: LLM time to first token (streaming only) and total
+- ``total``: the whole turn
+- ``vector_batch``, ``graph_batch``, ``lexical_batch``: batched retrieval in
+  ``process_queries``, observed once per batch by ``record_batch``
+
+Export with ``to_prometheus()``, ``write(path)`` or ``serve(port)``.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in milliseconds; the last bucket is +Inf
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+# Stages timed once for a whole process_queries batch and copied into every answer
+BATCH_KEYS = {"vector_batch", "graph_batch", "lexical_batch"}
+# Timing keys that are not per-query latencies
+NON_LATENCY_KEYS = {"batch_size"} | BATCH_KEYS
+
+
+@contextmanager
+def timed(timings, name):
+    """Add the block's wall time in milliseconds to ``timings[name]``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        timings[name] = round(timings.get(name, 0.0) + elapsed, 2)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile (None when empty)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """Thread-safe stage latency histograms plus a few counters"""
+
+    def __init__(self, prefix="medrag", buckets=LATENCY_BUCKETS_MS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, milliseconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.buckets)
+            histogram.observe(milliseconds)
+
+    def increment(self, name, labels=(), amount=1):
+        """``labels`` is a tuple of (label, value) pairs"""
+        key = (name, tuple(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def record(self, source_details):
+        """Observe every stage latency of one answered query"""
+        for stage, value in source_details.get("timings", {}).items():
+            if stage not in NON_LATENCY_KEYS and isinstance(value, (int, float)):
+                self.observe(stage, value)
+        self.increment("queries_total", (("route", source_details.get("route", "none")),))
+        for name in ("retrieval_cache", "response_cache"):
+            status = source_details.get(name)
+            if status is not None:
+                self.increment(f"{name}_total", (("result", status),))
+
+    def record_batch(self, timings):
+        """Observe the shared batch stages of one ``process_queries`` call"""
+        for stage in BATCH_KEYS & timings.keys():
+            self.observe(stage, timings[stage])
+
+    def summary(self):
+        """{stage: {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"}} for display"""
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "mean_ms": round(h.sum / h.count, 2),
+                    "p50_ms": h.quantile(0.5),
+                    "p95_ms": h.quantile(0.95),
+                    "p99_ms": h.quantile(0.99),
+                }
+                for stage, h in sorted(self.histograms.items()) if h.count
+            }
+
+    def snapshot(self):
+        """JSON-serializable copy of every histogram and counter, for ``merge``"""
+        with self._lock:
+            return {
+                "histograms": {stage: {"buckets": list(h.buckets), "counts": list(h.counts),
+                                       "sum": h.sum}
+                               for stage, h in self.histograms.items()},
+                "counters": [[name, [list(label) for label in labels], value]
+                             for (name, labels), value in self.counters.items()],
+            }
+
+    def merge(self, snapshot):
+        """Add another registry's ``snapshot()`` (e.g. from a sibling worker process)"""
+        with self._lock:
+            for stage, data in snapshot["histograms"].items():
+                histogram = self.histograms.get(stage)
+                if histogram is None:
+                    histogram = self.histograms[stage] = Histogram(data["buckets"])
+                if list(histogram.buckets) != list(data["buckets"]):
+                    raise ValueError(f"Histogram buckets for {stage!r} do not match")
+                histogram.counts = [a + b for a, b in zip(histogram.counts, data["counts"])]
+                histogram.count = sum(histogram.counts)
+                histogram.sum += data["sum"]
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        name = f"{self.prefix}_stage_latency_milliseconds"
+        lines = [f"# HELP {name} Query path latency per stage.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum:.3f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+
+            typed = set()
+            for (counter, labels), value in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{counter}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                label_text = ",".join(f'{label}="{value_}"' for label, value_ in labels)
+                lines.append(f"{metric}{{{label_text}}} {value}" if label_text
+                             else f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Atomically replace ``path`` with the Prometheus text (node_exporter textfile format)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host="0.0.0.0"):
+        """Serve GET /metrics from a daemon thread; returns the HTTP server"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics():
+    """Process-wide registry shared by every agent"""
+    return _registry
@@ -0,0 +1,107 @@
+from collections import defaultdict
+
+class NodeIndex:
+    """Substring index over graph node names.
+
+    Answers the two lookups ``query_graph`` needs without scanning every node:
+    nodes whose name contains a pattern (n-gram postings) and nodes whose name
+    is contained in a text (character trie walked from every text position).
+    """
+
+    def __init__(self, gram_size=3):
+        self.gram_size = gram_size
+        self.grams = defaultdict(set)      # n-gram (1..gram_size chars) -> names
+        self.names = defaultdict(set)      # lowercased name -> original nodes
+        self.trie = {}
+        self.max_name_len = 0
+        self.node_count = 0
+        self.graph_id = None
+
+    def __len__(self):
+        return self.node_count
+
+    @classmethod
+    def from_graph(cls, graph):
+        index = cls()
+        index.rebuild(graph)
+        return index
+
+    def rebuild(self, graph):
+        self.grams.clear()
+        self.names.clear()
+        self.trie = {}
+        self.max_name_len = 0
+        self.node_count = 0
+        for node in graph.nodes():
+            self.add(node)
+        self.graph_id = id(graph)
+
+    def add(self, node):
+        name = str(node).lower()
+        known = name in self.names
+        if node not in self.names[name]:
+            self.names[name].add(node)
+            self.node_count += 1
+        if known:
+            return
+        self.max_name_len = max(self.max_name_len, len(name))
+
+        for size in range(1, self.gram_size + 1):
+            for i in range(len(name) - size + 1):
+                self.grams[name[i:i + size]].add(name)
+
+        level = self.trie
+        for char in name:
+            level = level.setdefault(char, {})
+        level[None] = name
+
+    def _nodes(self, names):
+        nodes = set()
+        for name in names:
+            nodes.update(self.names[name])
+        return nodes
+
+    def names_containing(self, pattern):
+        """Names that contain ``pattern`` as a substring."""
+        if not pattern:
+            return set(self.names)
+        if len(pattern) <= self.gram_size:
+            return set(self.grams.get(pattern, ()))
+
+        size = self.gram_size
+        postings = []
+        for i in range(len(pattern) - size + 1):
+            posting = self.grams.get(pattern[i:i + size])
+            if not posting:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return candidates
+        return {name for name in candidates if pattern in name}
+
+    def names_contained_in(self, text):
+        """Names that occur as a substring of ``text``."""
+        found = set()
+        if None in self.trie:
+            found.add(self.trie[None])
+        for start in range(len(text)):
+            level = self.trie
+            for char in text[start:start + self.max_name_len]:
+                level = level.get(char)
+                if level is None:
+                    break
+                if None in level:
+                    found.add(level[None])
+        return found
+
+    def match(self, query_lower, keywords):
+        """Nodes matching the query the same way the full node scan does."""
+        names = self.names_containing(query_lower) | self.names_contained_in(query_lower)
+        for keyword in keywords:
+            names |= self.names_containing(keyword)
+            names |= self.names_contained_in(keyword)
+        return self._nodes(names)
@@ -0,0 +1,37 @@
+import threading
+
+RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """Re-scores the top fused candidates with a small CPU cross-encoder.
+
+    The model is loaded on first use. Only ``max_candidates`` are scored, which
+    bounds the added latency; the rest keep their fused order after them.
+    """
+
+    def __init__(self, model_name=RERANKER_MODEL, max_candidates=8, batch_size=16):
+        self.model_name = model_name
+        self.max_candidates = max_candidates
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, device="cpu")
+            return self._model
+
+    def rerank(self, query, candidates):
+        head = candidates[:self.max_candidates]
+        if len(head) < 2:
+            return candidates
+        scores = self.model.predict([(query, c["text"]) for c in head],
+                                    batch_size=self.batch_size, show_progress_bar=False)
+        for candidate, score in zip(head, scores):
+            candidate["rerank_score"] = float(score)
+        head = sorted(head, key=lambda c: -c["rerank_score"])
+        return head + candidates[self.max_candidates:]
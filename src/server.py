@@ -0,0 +1,348 @@
+"""Headless HTTP/JSON query service around HybridRAGAgent with pre-forked workers.
+
+    python -m src.server --port 8000 --workers 4
+
+The parent process loads the vector index, chunk store, knowledge graph
+and (with BM25_ENABLED) the BM25 index once, opens the listening socket and
+then forks the workers, which accept connections on that shared socket. The
+large structures are not copied per worker: the FAISS index and the encoder
+weights are never written after load, so their pages stay shared
+copy-on-write, and the chunk store and the .kgb graph (and BM25 file) are
+read through mmap from the shared page cache. ``gc.freeze()`` keeps the
+garbage collector from touching (and so copying) the objects loaded before
+the fork.
+A worker that dies is replaced.
+
+Endpoints:
+
+- ``POST /query`` ``{"query": ...}`` -> ``{"answer", "source_details"}``.
+  With ``"stream": true`` the response is JSON Lines: ``{"event": "details"}``,
+  then ``{"event": "token"}`` per piece, then ``{"event": "done"}`` carrying the
+  answer and the final source details. ``{"queries": [...]}`` answers a batch
+  with ``process_queries``. ``vector_timeout`` and ``graph_timeout`` are optional.
+- ``GET /health``: worker pid, vector and graph sizes
+- ``GET /metrics``: stage latency histograms merged across all workers
+
+The agent is configured with the same environment variables as app.py.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+DEFAULT_PDF_PATH = "data/The_GALE_ENCYCLOPEDIA_of_MEDICINE_SECOND.pdf"
+# Request bodies larger than this are rejected
+MAX_BODY_BYTES = 1 << 20
+# A worker that dies sooner than this after starting is restarted with a delay
+RESPAWN_BACKOFF_SECONDS = 1.0
+
+
+def build_agent(pdf_path=DEFAULT_PDF_PATH, llm=None):
+    """HybridRAGAgent configured from the same environment variables as app.py"""
+    from src.vector_store import create_vectorstore_from_pdf
+    from src.knowledge_graph import load_or_create_knowledge_graph
+    from src.hybrid_agent import HybridRAGAgent
+    from src.cache import ResponseCache, RetrievalCache
+    from src.reranker import CrossEncoderReranker
+    from src.bm25_index import load_or_build_bm25
+
+    vectorstore = create_vectorstore_from_pdf(pdf_path)
+    knowledge_graph = load_or_create_knowledge_graph(pdf_path)
+    lexical_index = (load_or_build_bm25(vectorstore)
+                     if os.getenv("BM25_ENABLED", "False").lower() == "true" else None)
+
+    cache_size = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+    similarity_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0") or 0) or None
+    # RETRIEVAL_CACHE_SIZE=0 disables the retrieval cache
+    retrieval_cache = (RetrievalCache(max_entries=cache_size,
+                                      ttl_seconds=int(os.getenv("RETRIEVAL_CACHE_TTL", "3600")),
+                                      similarity_threshold=similarity_threshold)
+                       if cache_size else None)
+    # Workers share the SQLite file; each opens its own connection after the fork
+    response_cache_path = os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite")
+    response_cache = (ResponseCache(response_cache_path,
+                                    max_disk_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "50000")),
+                                    ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL",
+                                                              str(7 * 24 * 3600))))
+                      if response_cache_path else None)
+    reranker = (CrossEncoderReranker(max_candidates=int(os.getenv("RERANK_CANDIDATES", "8")))
+                if os.getenv("RERANKER_ENABLED", "False").lower() == "true" else None)
+    return HybridRAGAgent(
+        vectorstore, knowledge_graph, retrieval_cache=retrieval_cache,
+        vector_timeout=float(os.getenv("VECTOR_TIMEOUT", "0") or 0) or None,
+        graph_timeout=float(os.getenv("GRAPH_TIMEOUT", "0") or 0) or None,
+        llm=llm, reranker=reranker,
+        context_token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "800")),
+        response_cache=response_cache, lexical_index=lexical_index
+    )
+
+
+def fake_llm(answer="• Point 1\n\n• Point 2\n\n• Point 3"):
+    """Offline chat model answering every prompt with ``answer`` (load tests)"""
+    from itertools import repeat
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+
+    return GenericFakeChatModel(messages=repeat(AIMessage(content=answer)))
+
+
+def warm_up(agent, query="What are the symptoms of diabetes?"):
+    """Load lazily built state (node index, encoder buffers) before the fork.
+
+    Calls the retrieval stages directly: running them through the agent's
+    thread pool would start threads that the forked workers do not inherit.
+    """
+    agent._vector_search(query)
+    agent._graph_search(query)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/health":
+            self._send_json(200, self.server.health())
+        elif path == "/metrics":
+            body = self.server.merged_metrics().to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/query":
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.send_error(413)
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "Request body is not valid JSON"})
+            return
+        timeouts = (request.get("vector_timeout"), request.get("graph_timeout"))
+        agent = self.server.agent
+
+        if isinstance(request.get("queries"), list):
+            results = agent.process_queries([str(q) for q in request["queries"]])
+            self.server.save_metrics()
+            self._send_json(200, {"results": [{"answer": answer, "source_details": details}
+                                              for answer, details in results]})
+            return
+        query = request.get("query")
+        if not isinstance(query, str) or not query.strip():
+            self._send_json(400, {"error": "Expected a non-empty 'query' string"})
+            return
+        if request.get("stream"):
+            self._stream(agent.stream_query_with_details(query, *timeouts))
+        else:
+            answer, source_details = agent.process_query_with_details(query, *timeouts)
+            self._send_json(200, {"answer": answer, "source_details": source_details})
+        self.server.save_metrics()
+
+    def _stream(self, events):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        source_details = None
+        for kind, value in events:
+            if kind == "details":
+                source_details = value
+                event = {"event": kind, "source_details": value}
+            elif kind == "token":
+                event = {"event": kind, "token": value}
+            else:
+                # Timings are completed after the details event was sent
+                event = {"event": kind, "answer": value, "source_details": source_details}
+            line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class QueryServer(ThreadingHTTPServer):
+    """HTTP server for one worker, accepting on a listening socket it did not open"""
+    daemon_threads = True
+
+    def __init__(self, sock, agent, metrics_dir=None, worker=0):
+        super().__init__(sock.getsockname()[:2], QueryHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.agent = agent
+        self.metrics_dir = metrics_dir
+        self.worker = worker
+        self._metrics_lock = threading.Lock()
+
+    def health(self):
+        return {
+            "status": "ok",
+            "worker": self.worker,
+            "pid": os.getpid(),
+            "vectors": self.agent.vectorstore.index.ntotal,
+            "graph_nodes": self.agent.knowledge_graph.graph.number_of_nodes(),
+        }
+
+    def _metrics_file(self, pid):
+        return os.path.join(self.metrics_dir, f"worker-{pid}.json")
+
+    def save_metrics(self):
+        """Publish this worker's histograms for the others' /metrics"""
+        if self.metrics_dir is None:
+            return
+        path = self._metrics_file(os.getpid())
+        with self._metrics_lock:
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(self.agent.metrics.snapshot(), f)
+            os.replace(f"{path}.tmp", path)
+
+    def merged_metrics(self):
+        """This worker's live registry plus every other worker's last snapshot.
+
+        Files of workers that exited are kept, so counters never go backwards.
+        """
+        from src.metrics import MetricsRegistry
+
+        if self.metrics_dir is None:
+            return self.agent.metrics
+        merged = MetricsRegistry(self.agent.metrics.prefix, self.agent.metrics.buckets)
+        merged.merge(self.agent.metrics.snapshot())
+        own = os.path.basename(self._metrics_file(os.getpid()))
+        for name in os.listdir(self.metrics_dir):
+            if name.endswith(".json") and name != own:
+                try:
+                    with open(os.path.join(self.metrics_dir, name), "r", encoding="utf-8") as f:
+                        merged.merge(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return merged
+
+
+def _run_worker(sock, agent, metrics_dir, worker):
+    server = QueryServer(sock, agent, metrics_dir, worker)
+    # The parent handles Ctrl-C and forwards SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM,
+                  lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    server.serve_forever()
+
+
+def serve(agent, host="0.0.0.0", port=8000, workers=4, backlog=256):
+    """Serve ``agent`` from ``workers`` forked processes until SIGTERM or Ctrl-C.
+
+    ``workers=0`` (or a platform without fork) serves from this process only.
+    """
+    sock = socket.create_server((host, port), backlog=backlog)
+    # All workers wait on the same socket; the ones that lose the accept race move on
+    sock.setblocking(False)
+    print(f"🌐 Serving on http://{host}:{sock.getsockname()[1]} with {workers} workers")
+    if workers <= 0 or not hasattr(os, "fork"):
+        try:
+            QueryServer(sock, agent).serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sock.close()
+        return
+
+    metrics_dir = tempfile.mkdtemp(prefix="medrag-metrics-")
+    # Objects loaded so far are never collected, so the GC leaves their pages shared
+    gc.collect()
+    gc.freeze()
+    children = {}
+    stopping = False
+
+    def spawn(worker):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(sock, agent, metrics_dir, worker)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = (worker, time.monotonic())
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker in range(workers):
+        spawn(worker)
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            worker, started = children.pop(pid, (None, 0.0))
+            if stopping or worker is None:
+                continue
+            print(f"⚠️ Worker {worker} (pid {pid}) exited with status {status}; restarting")
+            if time.monotonic() - started < RESPAWN_BACKOFF_SECONDS:
+                time.sleep(RESPAWN_BACKOFF_SECONDS)
+            spawn(worker)
+    finally:
+        sock.close()
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    print("👋 Server stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve HybridRAGAgent over HTTP/JSON")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="forked worker processes; 0 serves from the main process")
+    parser.add_argument("--pdf", default=DEFAULT_PDF_PATH)
+    parser.add_argument("--fake-llm", action="store_true",
+                        help="answer with a fixed offline model instead of Groq (load tests)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    started = time.perf_counter()
+    agent = build_agent(args.pdf, llm=fake_llm() if args.fake_llm else None)
+    warm_up(agent)
+    print(f"✅ Agent ready in {time.perf_counter() - started:.1f}s: "
+          f"{agent.vectorstore.index.ntotal} vectors, "
+          f"{agent.knowledge_graph.graph.number_of_nodes()} graph nodes")
+    serve(agent, args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Wall-clock breakdown of system start-up by phase"""
+
+    def __init__(self):
+        self.phases = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases[name] = round(self.phases.get(name, 0.0) + elapsed, 3)
+
+    def report(self):
+        """Print the breakdown and return it as {"phases": {...}, "total_seconds": ...}"""
+        total = round(time.perf_counter() - self._started, 3)
+        print(f"⏱️ Startup took {total:.2f}s")
+        for name, seconds in self.phases.items():
+            share = seconds / total * 100 if total else 0.0
+            print(f"  {name:<12}{seconds:>8.2f}s {share:>5.1f}%")
+        return {"phases": dict(self.phases), "total_seconds": total}
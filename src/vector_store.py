@@ -1,58 +1,110 @@
 import os
 import streamlit as st
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from src.chunk_store import ChunkStore, use_chunk_store
+from src.embedding_service import get_embeddings
+from src.ann_index import (
+    REMOVABLE_TYPES, convert_vectorstore_index, load_index_config, resolve_params,
+    save_index_config, tune_vectorstore
+)
+
+def _finalize_index(vectorstore, persist_dir, index_type, index_params, current_type="flat"):
+    """Convert the built index to the requested type and persist its config"""
+    if index_type == current_type:
+        return vectorstore
+    print(f"🏗️ Building {index_type} index over {vectorstore.index.ntotal} vectors")
+    config = convert_vectorstore_index(vectorstore, index_type, index_params, current_type)
+    vectorstore.save_local(persist_dir)
+    save_index_config(persist_dir, config)
+    return vectorstore
 
 @st.cache_resource
-def create_vectorstore_from_pdf(pdf_path, persist_dir="faiss_vectorstore"):
-    """Create and cache FAISS vectorstore from PDF"""
+def create_vectorstore_from_pdf(pdf_path, persist_dir="faiss_vectorstore", streaming=True,
+                                batch_size=64, workers=None, refresh=False,
+                                index_type=None, index_params=None):
+    """Create and cache FAISS vectorstore from PDF.
+
+    With ``streaming`` the PDF is parsed by a process pool and embedded in
+    batches, keeping memory flat; otherwise the whole PDF is loaded at once.
+    Streaming builds checkpoint per-page hashes, so an interrupted build
+    resumes and ``refresh`` re-embeds only pages whose text changed.
+
+    ``index_type`` selects flat, sq_fp16, ivf_flat, hnsw or ivf_pq (see src/ann_index.py)
+    and defaults to the persisted type, or flat for a new build. Build
+    parameters are saved in index_config.json; search-time ones (nprobe,
+    ef_search) in ``index_params`` override them on load.
+    """
+    # pypdf and the text splitter are only imported once a PDF is actually ingested
+    from src.ingest import ingest_pdf_streaming, load_ingest_manifest, make_text_splitter
+
+    if index_type is not None:
+        resolve_params(index_type, index_params)
+    embeddings = get_embeddings()
     
     # Check if vectorstore already exists
-    if os.path.exists(persist_dir):
+    has_index = os.path.exists(os.path.join(persist_dir, "index.faiss"))
+    manifest = load_ingest_manifest(persist_dir) if has_index else None
+    resumable = manifest is not None and (refresh or not manifest.get("complete"))
+    if has_index and (resumable or not refresh):
         print(f"✅ Loading existing vectorstore from {persist_dir}")
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
         vectorstore = FAISS.load_local(
             persist_dir, 
             embeddings, 
             allow_dangerous_deserialization=True
         )
         print(f"✅ Vectorstore loaded with {vectorstore.index.ntotal} vectors")
+        if not isinstance(vectorstore.docstore, ChunkStore):
+            # Stores saved before the chunk store: move the text out of index.pkl once
+            print(f"📦 Moving {len(vectorstore.index_to_docstore_id)} chunks to the mmap chunk store")
+            use_chunk_store(vectorstore, persist_dir)
+            vectorstore.save_local(persist_dir)
+        config = load_index_config(persist_dir)
+        current_type = config["index_type"]
+        index_type = index_type or current_type
+        if not resumable:
+            if current_type != index_type:
+                return _finalize_index(vectorstore, persist_dir, index_type, index_params,
+                                       current_type)
+            tune_vectorstore(vectorstore, config, index_params)
+            return vectorstore
+        if current_type not in REMOVABLE_TYPES:
+            _finalize_index(vectorstore, persist_dir, "flat", None, current_type)
+            current_type = "flat"
+        print(f"🔁 {'Refreshing' if manifest.get('complete') else 'Resuming'} ingestion of {pdf_path}")
+        vectorstore = ingest_pdf_streaming(pdf_path, embeddings, persist_dir, vectorstore=vectorstore,
+                                           manifest=manifest, batch_size=batch_size, workers=workers)
+        if current_type != index_type:
+            return _finalize_index(vectorstore, persist_dir, index_type, index_params, current_type)
+        tune_vectorstore(vectorstore, config, index_params)
         return vectorstore
     
     print(f"📄 Creating FAISS vectorstore from PDF: {pdf_path}")
     
+    index_type = index_type or "flat"
+    save_index_config(persist_dir, {"index_type": "flat", "params": {}})
+    if streaming:
+        vectorstore = ingest_pdf_streaming(pdf_path, embeddings, persist_dir,
+                                           batch_size=batch_size, workers=workers)
+        return _finalize_index(vectorstore, persist_dir, index_type, index_params)
+
     # Load PDF
+    from langchain_community.document_loaders import PyPDFLoader
     loader = PyPDFLoader(pdf_path)
     documents = loader.load()
     
     # Split documents
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,  # Increased for better context
-        chunk_overlap=200,  # Increased overlap
-        length_function=len
-    )
-    chunks = text_splitter.split_documents(documents)
+    chunks = make_text_splitter().split_documents(documents)
     print(f"📋 Created {len(chunks)} chunks from PDF")
     
-    # Create embeddings
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'}
-    )
-    
     # Create FAISS vectorstore
     vectorstore = FAISS.from_documents(chunks, embeddings)
+    use_chunk_store(vectorstore, persist_dir)
     
     # Save vectorstore
     vectorstore.save_local(persist_dir)
     print(f"✅ FAISS vectorstore created and saved to {persist_dir}")
     
-    return vectorstore
+    return _finalize_index(vectorstore, persist_dir, index_type, index_params)
 
 def similarity_search(vectorstore, query, k=10):
     """Search similar documents"""
@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import pytest
+
+fake_chat_models = pytest.importorskip("langchain_core.language_models.fake_chat_models")
+from langchain_core.messages import AIMessage
+
+from src.cache import ResponseCache
+from src.hybrid_agent import HybridRAGAgent
+from src.metrics import MetricsRegistry
+
+
+class FakeEmbeddings:
+    def embed_query(self, query):
+        return [1.0, 0.0]
+
+
+class FakeVectorStore:
+    embeddings = FakeEmbeddings()
+
+    def similarity_search_with_score_by_vector(self, embedding, k):
+        return [(SimpleNamespace(page_content="Influenza is a viral infection."), 0.1)]
+
+
+class FakeKnowledgeGraph:
+    def query_graph_scored(self, query, max_results=5, timings=None):
+        return [(("influenza", "has_symptom", "fever"), 0.9)]
+
+
+def test_stream_events_and_cache_replay(tmp_path):
+    llm = fake_chat_models.GenericFakeChatModel(
+        messages=iter([AIMessage(content="Rest and drink fluids.")])
+    )
+    agent = HybridRAGAgent(FakeVectorStore(), FakeKnowledgeGraph(), llm=llm,
+                           response_cache=ResponseCache(str(tmp_path / "responses.sqlite")),
+                           metrics=MetricsRegistry())
+
+    events = list(agent.stream_query_with_details("How is flu treated?"))
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "details" and kinds[-1] == "done"
+    assert set(kinds[1:-1]) == {"token"}
+    details, answer = events[0][1], events[-1][1]
+    assert details["response_cache"] == "miss"
+    assert details["graph_results"] == ["influenza has_symptom fever"]
+    assert "".join(text for kind, text in events if kind == "token") == answer
+    assert answer == "Rest and drink fluids."
+
+    # The fake model has no messages left: the answer must come from the cache
+    replay = list(agent.stream_query_with_details("How is flu treated?"))
+    assert [kind for kind, _ in replay] == ["details", "token", "done"]
+    assert replay[0][1]["response_cache"] == "hit"
+    assert replay[-1][1] == answer